@@ -0,0 +1,232 @@
+"""Offline latency benchmark for recipe and profession searches.
+
+Replays a query mix against the real recipe catalog and synthetic catalogs
+scaled up from it. Needs neither Discord nor Postgres.
+
+    python benchmarks/bench_search.py
+    python benchmarks/bench_search.py --scale 1 10 100 --save baseline.json
+    python benchmarks/bench_search.py --compare baseline.json --tolerance 1.5
+
+With --compare the exit status is 1 when any p95 latency regressed by more
+than the tolerance factor, so it can gate changes to search.py.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from discord_bot.catalog import build_catalog  # noqa: E402
+from discord_bot.profession import find_profession, profession_lookup  # noqa: E402
+from discord_bot.search import SearchIndex, search, search_cache  # noqa: E402
+
+SYNTHETIC_PREFIXES = [
+    "Greater",
+    "Lesser",
+    "Superior",
+    "Runed",
+    "Heavy",
+    "Glowing",
+    "Ancient",
+    "Savage",
+    "Frostforged",
+    "Shadowbound",
+]
+
+SYNTHETIC_SUFFIXES = [
+    "of the Bear",
+    "of the Eagle",
+    "of the Monkey",
+    "of the Owl",
+    "of the Tiger",
+    "of Stamina",
+    "of Healing",
+    "of Shadow Wrath",
+    "of Fire Resistance",
+    "of the Whale",
+]
+
+
+def catalog_names(scale: int) -> list[str]:
+    names = build_catalog().names()
+    if scale == 1:
+        return names
+
+    # every extra copy of the catalog gets a distinct prefix/suffix pair
+    scaled = list(names)
+    for copy in range(1, scale):
+        prefix = SYNTHETIC_PREFIXES[copy % len(SYNTHETIC_PREFIXES)]
+        suffix = SYNTHETIC_SUFFIXES[(copy // len(SYNTHETIC_PREFIXES)) % 10]
+        scaled.extend(f"{prefix} {name} {suffix} {copy}" for name in names)
+
+    return scaled
+
+
+def _typo(word: str, rng: random.Random) -> str:
+    if len(word) < 4:
+        return word
+
+    position = rng.randrange(1, len(word) - 1)
+    edit = rng.choice(["drop", "swap", "replace"])
+    if edit == "drop":
+        return word[:position] + word[position + 1 :]
+    if edit == "swap":
+        return (
+            word[: position - 1]
+            + word[position]
+            + word[position - 1]
+            + word[position + 1 :]
+        )
+    return word[:position] + rng.choice("aeiou") + word[position + 1 :]
+
+
+def query_mix(names: list[str], count: int, seed: int) -> dict[str, list[str]]:
+    rng = random.Random(seed)
+    samples = [rng.choice(names) for _ in range(count)]
+
+    return {
+        "exact": list(samples),
+        "prefix": [name[: max(3, len(name) // 3)] for name in samples],
+        "typo": [
+            " ".join(_typo(word, rng) for word in name.split()) for name in samples
+        ],
+        "multi-word": [
+            " ".join(rng.sample(name.split(), min(2, len(name.split()))))
+            for name in samples
+        ],
+        "no-hit": [
+            "".join(rng.choice("qxzjv") for _ in range(rng.randint(4, 12)))
+            for _ in samples
+        ],
+    }
+
+
+def profession_queries(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    keys = list(profession_lookup)
+
+    # mostly direct hits, with some typos that need the fuzzy fallback
+    return [
+        _typo(rng.choice(keys), rng) if rng.random() < 0.2 else rng.choice(keys)
+        for _ in range(count)
+    ]
+
+
+def measure(run, queries: list[str]) -> dict[str, float]:
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        run(query)
+        latencies.append(time.perf_counter() - start)
+
+    # tracing slows every allocation down, so it gets a pass of its own
+    allocated = []
+    tracemalloc.start()
+    try:
+        for query in queries:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            run(query)
+            _, peak = tracemalloc.get_traced_memory()
+            allocated.append(max(0, peak - before))
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+    return {
+        "p50_us": percentile(0.50) * 1e6,
+        "p95_us": percentile(0.95) * 1e6,
+        "p99_us": percentile(0.99) * 1e6,
+        "max_us": latencies[-1] * 1e6,
+        "mean_alloc_kb": statistics.fmean(allocated) / 1024,
+    }
+
+
+def run_benchmarks(scales: list[int], count: int, seed: int) -> dict[str, dict]:
+    results = {}
+
+    for scale in scales:
+        names = catalog_names(scale)
+
+        start = time.perf_counter()
+        index = SearchIndex(names)
+        build_ms = (time.perf_counter() - start) * 1e3
+        results[f"x{scale}/build"] = {"build_ms": build_ms, "names": len(index)}
+
+        for kind, queries in query_mix(names, count, seed).items():
+            # uncached: straight to the index
+            results[f"x{scale}/find/{kind}"] = measure(index.find, queries)
+
+            # cached: through search() after a warm-up pass
+            search_cache.clear()
+            for query in queries:
+                search([query], index)
+            results[f"x{scale}/search-cached/{kind}"] = measure(
+                lambda query: search([query], index), queries
+            )
+
+    results["find_profession"] = measure(
+        find_profession, profession_queries(count, seed)
+    )
+
+    return results
+
+
+def print_results(results: dict[str, dict]):
+    for name, result in results.items():
+        fields = "  ".join(
+            f"{key}={value:.1f}" if isinstance(value, float) else f"{key}={value}"
+            for key, value in result.items()
+        )
+        print(f"{name:<36} {fields}")
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], tolerance: float):
+    regressions = []
+    for name, result in results.items():
+        if "p95_us" not in result or name not in baseline:
+            continue
+
+        before = baseline[name]["p95_us"]
+        after = result["p95_us"]
+        if before > 0 and after / before > tolerance:
+            regressions.append(f"{name}: p95 {before:.1f}us -> {after:.1f}us")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", type=Path, help="write results as JSON")
+    parser.add_argument("--compare", type=Path, help="baseline JSON to gate on")
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.scale, args.queries, args.seed)
+    print_results(results)
+
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2))
+
+    if args.compare:
+        regressions = compare(
+            results, json.loads(args.compare.read_text()), args.tolerance
+        )
+        if regressions:
+            print("\nRegressions:", *regressions, sep="\n")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Startup benchmark for loading the catalog snapshot the bot starts with.
+
+Times load_snapshot(), the catalog with its search indexes and autocomplete
+tries, then the first query and the first completion. Compares building them
+from the recipe modules with loading the compiled JSON artifact and the
+memory-mapped .bin artifact. Every run is a fresh interpreter, so module
+imports are part of the measurement.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+sys.path.insert(0, str(SRC_DIR))
+
+from discord_bot.catalog_compiler import (  # noqa: E402
+    compile_catalog,
+    write_compiled_catalog,
+)
+
+# the first query after startup, with a typo so the vocabulary is read too
+FIRST_QUERY = "arcanit reapr"
+# the first autocomplete after startup
+FIRST_PREFIX = "smelt th"
+
+CHILD = """
+import json, resource, sys, time
+
+start = time.perf_counter()
+from discord_bot.catalog import load_snapshot
+
+snapshot = load_snapshot()
+loaded = time.perf_counter()
+
+snapshot.recipe_index.find(sys.argv[1])
+queried = time.perf_counter()
+
+snapshot.profession_recipe_trie.complete(sys.argv[2])
+completed = time.perf_counter()
+
+print(json.dumps({
+    "load_ms": (loaded - start) * 1e3,
+    "first_query_ms": (queried - loaded) * 1e3,
+    "first_completion_ms": (completed - queried) * 1e3,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+
+def run_child(catalog_path: Path) -> dict[str, float]:
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(SRC_DIR),
+        "RECIPE_CATALOG_PATH": str(catalog_path),
+    }
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, FIRST_QUERY, FIRST_PREFIX],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        compiled = compile_catalog()
+
+        json_path = directory / "recipe_catalog.json"
+        write_compiled_catalog(json_path, compiled)
+        mmap_path = directory / "recipe_catalog.bin"
+        write_compiled_catalog(mmap_path, compiled)
+
+        modes = {
+            # a missing artifact makes load_snapshot() import the modules
+            "modules": directory / "missing.json",
+            "json": json_path,
+            "mmap": mmap_path,
+        }
+
+        for mode, catalog_path in modes.items():
+            runs = [run_child(catalog_path) for _ in range(args.runs)]
+            fields = "  ".join(
+                f"{key}={statistics.median(run[key] for run in runs):.1f}"
+                for key in runs[0]
+            )
+            print(f"{mode:<8} {fields}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,55 @@
+import asyncio
 import logging
 import os
+import re
 import sys
 import discord
-from discord.ext import commands
+from discord import app_commands
+from discord.ext import commands, tasks
 
+from discord_bot.catalog import load_snapshot, reload_snapshot
 from discord_bot.database import (
     add_profession,
     add_user,
-    add_user_recipe,
-    get_all_professions,
-    get_all_recipes,
-    get_user_professions,
-    get_user_recipes,
+    add_user_recipes,
+    close_pool,
+    create_pool,
+    get_profession_members,
+    get_recipe_crafters,
+    get_registered_recipe_names,
+    listen_for_changes,
+    load_directory,
+    load_user_context,
     remove_profession,
-    remove_user_recipe,
+    remove_user_recipes,
+    sync_recipe_catalog,
+    update_user_names,
     validate_connection,
 )
-from discord_bot.profession import Profession, profession_aliases
-from discord_bot.profession_recipes import profession_recipes
-from discord_bot.search import search
+from discord_bot.directory import DIRECTORY_RECONCILE_INTERVAL, directory
+from discord_bot.migrate import migrate
+from discord_bot.profession import Profession, find_profession
+from discord_bot.search import index_cache, search, search_cache
+from discord_bot.trie import ShardedPrefixTrie, complete_names
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 DISCORD_BOT_TOKEN = os.environ["DISCORD_BOT_TOKEN"]
 
+SEARCH_RESULT_LIMIT = 20
+
+# largest attached export !import-recipes reads, in bytes
+IMPORT_ATTACHMENT_LIMIT = 256 * 1024
+
+# addon exports list one recipe per line or comma separated, a spell id
+# optionally followed by the name, e.g. `16153`, `16153:Smelt Thorium`
+RECIPE_EXPORT_SEPARATOR = re.compile(r"[\n,;]")
+RECIPE_EXPORT_ID = re.compile(r"(\d+)\b")
+
+# seconds between two bulk updates of changed display names
+USER_NAME_FLUSH_INTERVAL = float(os.environ.get("USER_NAME_FLUSH_INTERVAL", 60.0))
+
 
 # Define the intents
 intents = discord.Intents.all()
@@ -33,32 +58,98 @@ intents.message_content = True  # This enables the bot to read message content
 # Create a new instance of the bot
 bot = commands.Bot(command_prefix="!", intents=intents)
 
+# prebuilt by the catalog compiler, or built from the recipe modules; commands
+# read it once, so a reload never changes it under a running command
+catalog_snapshot = load_snapshot()
+
+# held while a new snapshot is built, so reloads don't pile up
+catalog_reload_lock = asyncio.Lock()
+
+# professions seen by earlier commands, so autocomplete never queries the db
+user_profession_cache: dict[int, list[Profession]] = {}
+
+# display names changed since the last flush, the latest one per user wins
+pending_user_names: dict[int, str] = {}
+
 
 @bot.event
 async def on_ready():
     logger.info(f"Logged in as {bot.user} (ID: {bot.user.id})")
     logger.info("Testing db connection...")
     await validate_connection()
+    await sync_recipe_catalog(_recipe_catalog_rows(catalog_snapshot.catalog))
 
+    # the first iteration loads the directory, later ones reconcile it
+    if not reconcile_directory.is_running():
+        reconcile_directory.start()
 
-def find_profession(raw_profession):
-    available_professions = [prof.name for prof in Profession] + [
-        alias for prof in profession_aliases for alias in profession_aliases[prof]
-    ]
+    if not flush_user_names.is_running():
+        flush_user_names.start()
 
-    matches = search([raw_profession], available_professions)
 
-    if matches and matches[raw_profession]:
-        match = matches[raw_profession][0]
+@tasks.loop(seconds=DIRECTORY_RECONCILE_INTERVAL)
+async def reconcile_directory():
+    # listen first, so no change slips in between the snapshot and the listener
+    await listen_for_changes()
+    await load_directory()
 
-        for prof in profession_aliases:
-            if match in profession_aliases[prof]:
-                match = prof.name
-                break
+    # the directory's counters are logged when it's loaded
+    logger.info(f"Search cache: {search_cache}, index cache: {index_cache}")
 
-        return Profession[match]
-    else:
-        return None
+
+@bot.event
+async def on_member_update(before, after):
+    if before.display_name != after.display_name:
+        pending_user_names[after.id] = after.display_name
+
+
+@bot.event
+async def on_user_update(before, after):
+    if before.display_name == after.display_name:
+        return
+
+    # a server nickname still wins over the new global name
+    display_name = after.display_name
+    for guild in bot.guilds:
+        member = guild.get_member(after.id)
+        if member is not None:
+            display_name = member.display_name
+            break
+
+    pending_user_names[after.id] = display_name
+
+
+@tasks.loop(seconds=USER_NAME_FLUSH_INTERVAL)
+async def flush_user_names():
+    if not pending_user_names:
+        return
+
+    user_names = list(pending_user_names.items())
+    pending_user_names.clear()
+
+    flushed = False
+    try:
+        flushed = await update_user_names(user_names)
+    finally:
+        # queued again for the next flush, unless the user was renamed meanwhile
+        if not flushed:
+            for user_id, user_name in user_names:
+                pending_user_names.setdefault(user_id, user_name)
+
+
+def _recipe_catalog_rows(recipe_catalog):
+    return [
+        (recipe.name, recipe.profession.value, recipe.id)
+        for recipe in recipe_catalog.recipes
+    ]
+
+
+async def _load_user_context(ctx):
+    # loaded at most once per command, however many helpers need it
+    if not hasattr(ctx, "user_context"):
+        ctx.user_context = await load_user_context(ctx.message.author.id)
+
+    return ctx.user_context
 
 
 async def _add_professions(ctx, raw_professions):
@@ -71,6 +162,7 @@ async def _add_professions(ctx, raw_professions):
         author = ctx.message.author
 
         await add_profession(author.id, profession.value)
+        user_profession_cache.pop(author.id, None)
 
         await ctx.send(
             f"Registered profession `{profession.value}` for user `{author.display_name}`."
@@ -92,6 +184,7 @@ async def remove_prof(ctx, *raw_professions):
         author = ctx.message.author
 
         await remove_profession(author.id, profession.value)
+        user_profession_cache.pop(author.id, None)
 
         await ctx.send(
             f"Removed profession `{profession.value}` for user `{author.display_name}`."
@@ -99,56 +192,68 @@ async def remove_prof(ctx, *raw_professions):
 
 
 @bot.command(name="prof")
-async def list_prof(ctx):
-    all_profs = await get_all_professions()
+async def list_prof(ctx, *raw_professions):
+    professions = None
+    if raw_professions:
+        professions = []
+        for raw_profession in raw_professions:
+            profession = find_profession(raw_profession)
+            if profession is None:
+                await ctx.send(f"Profession `{raw_profession}` not found.")
+                continue
 
-    if all_profs is None:
-        await ctx.send("An error occurred.")
-        return
+            professions.append(profession.value)
 
-    unique_professions = {prof["profession_name"] for prof in all_profs}
+        if not professions:
+            return
 
-    profession_groups = {
-        profession: [
-            prof["user_name"]
-            for prof in all_profs
-            if prof["profession_name"] == profession
-        ]
-        for profession in unique_professions
-    }
+    profession_groups = await get_profession_members(professions)
 
-    if len(all_profs) == 0:
+    if profession_groups is None:
+        await ctx.send("An error occurred.")
+        return
+
+    if len(profession_groups) == 0:
         await ctx.send("No professions registered.")
     else:
         prof_groups = [
-            f"`{profession}`: {', '.join([f"`{author}`" for author in authors])}"
-            for profession, authors in profession_groups.items()
+            f"`{group["profession_name"]}`: {', '.join([f"`{author}`" for author in group["user_names"]])}"
+            for group in profession_groups
         ]
         await ctx.send("\n".join(prof_groups))
 
 
 @bot.command(name="my-prof")
 async def my_prof(ctx, *raw_professions):
-    await add_user(ctx.message.author.id, ctx.message.author.display_name)
+    author = ctx.message.author
+    user_context = await _load_user_context(ctx)
+
+    # only new users and changed names need the upsert
+    if user_context is None or user_context["user_name"] != author.display_name:
+        await add_user(author.id, author.display_name)
 
     if len(raw_professions) > 0:
         await _add_professions(ctx, raw_professions)
         return
 
-    user_professions = await get_user_professions(ctx.message.author.id)
-    author = ctx.message.author
+    user_professions = user_context["professions"] if user_context else None
     if not user_professions:
         await ctx.send(f"No professions registered for user `{author.display_name}`.")
     else:
         await ctx.send(
-            f"Registered professions: {', '.join([f'`{profession["profession_name"]}`' for profession in user_professions])}"
+            f"Registered professions: {', '.join([f'`{profession}`' for profession in user_professions])}"
         )
 
 
 @bot.command(name="add-recipe")
 async def add_recipe(ctx, *search_recipes):
+    await _add_recipes(ctx, search_recipes)
+
+
+async def _add_recipes(ctx, search_recipes):
     try:
-        user_professions = await get_user_professions(ctx.message.author.id)
+        user_context = await _load_user_context(ctx)
+        user_professions = user_context["professions"] if user_context else None
 
         if not user_professions:
             await ctx.send(
@@ -156,78 +261,204 @@ async def add_recipe(ctx, *search_recipes):
             )
             return
 
-        user_professions = [
-            Profession(prof["profession_name"]) for prof in user_professions
-        ]
+        user_professions = [Profession(prof) for prof in user_professions]
+        user_profession_cache[ctx.message.author.id] = user_professions
 
         if not search_recipes:
             await ctx.send("Please provide one or more recipes to register.")
             return
 
-        all_recipe_names = [
-            recipe_name
-            for profession, recipes in profession_recipes.items()
-            if profession in user_professions
-            for recipe_name in list(recipes.keys())
-        ]
-
-        matches = search(search_recipes, all_recipe_names)
+        profession_recipe_index = catalog_snapshot.profession_recipe_index
+        matches = search(
+            search_recipes, profession_recipe_index.select(user_professions)
+        )
 
+        # resolve every recipe first, so they're all written in one round trip
+        matched_recipes = []
+        messages = []
         for key, recipes in matches.items():
             if not recipes:
-                await ctx.send(f"No recipe found for `{key}`.")
+                messages.append(f"No recipe found for `{key}`.")
                 continue
             else:
                 if len(recipes) > 1:
-                    await ctx.send(
+                    messages.append(
                         f"`{key}` matches multiples recipes: {', '.join([f'`{match}`' for match in recipes])}.\nPlease be more specific."
                     )
                     continue
                 else:
                     matched_recipe = recipes[0]
-                    await add_user_recipe(ctx.message.author.id, matched_recipe)
-                    await ctx.send(f"Added recipe `{matched_recipe}`.")
+                    if matched_recipe not in matched_recipes:
+                        matched_recipes.append(matched_recipe)
+                    messages.append(f"Added recipe `{matched_recipe}`.")
+
+        if matched_recipes and not await add_user_recipes(
+            ctx.message.author.id, matched_recipes
+        ):
+            await ctx.send("Failed to add recipes.")
+            return
+
+        for message in messages:
+            await ctx.send(message)
     except Exception as e:
         logger.info(f"An error occurred: {e}")
         await ctx.send("Failed to add recipes. (Something is broken)")
 
 
+def _recipe_export_keys(export: str) -> list[int | str]:
+    keys = []
+    for entry in RECIPE_EXPORT_SEPARATOR.split(export):
+        entry = entry.strip()
+        if not entry:
+            continue
+
+        match = RECIPE_EXPORT_ID.match(entry)
+        keys.append(int(match.group(1)) if match else entry)
+
+    return keys
+
+
+def _format_keys(keys: list[int | str]) -> str:
+    formatted = ", ".join(f"`{key}`" for key in keys[:SEARCH_RESULT_LIMIT])
+    if len(keys) > SEARCH_RESULT_LIMIT:
+        formatted += f" ... and `{len(keys) - SEARCH_RESULT_LIMIT}` more"
+
+    return formatted
+
+
+@bot.command(name="import-recipes")
+async def import_recipes(ctx, *, export: str = ""):
+    try:
+        user_context = await _load_user_context(ctx)
+        user_professions = user_context["professions"] if user_context else None
+
+        if not user_professions:
+            await ctx.send(
+                "No professions registered. Add professions with `!prof <prof>`."
+            )
+            return
+
+        user_professions = [Profession(prof) for prof in user_professions]
+        user_profession_cache[ctx.message.author.id] = user_professions
+
+        keys = _recipe_export_keys(export)
+        for attachment in ctx.message.attachments:
+            if attachment.size > IMPORT_ATTACHMENT_LIMIT:
+                await ctx.send(f"`{attachment.filename}` is too large to import.")
+                return
+
+            content = await attachment.read()
+            keys.extend(_recipe_export_keys(content.decode(errors="replace")))
+
+        if not keys:
+            await ctx.send("Please paste or attach the recipe ids or names to import.")
+            return
+
+        # exact ids and names only, a fuzzy match could import the wrong recipe
+        # without anyone noticing among hundreds
+        recipe_catalog = catalog_snapshot.catalog
+        imported_recipes = {}
+        unknown_keys = []
+        other_profession_keys = []
+        ambiguous_keys: dict[int | str, list[str]] = {}
+        for key in keys:
+            if not recipe_catalog.lookup(key):
+                unknown_keys.append(key)
+                continue
+
+            recipe_names = list(
+                dict.fromkeys(
+                    recipe.name
+                    for recipe in recipe_catalog.lookup(key, user_professions)
+                )
+            )
+            if not recipe_names:
+                other_profession_keys.append(key)
+            elif len(recipe_names) > 1:
+                ambiguous_keys[key] = recipe_names
+            else:
+                imported_recipes[recipe_names[0]] = None
+
+        registered_recipes = set(user_context["recipes"])
+        new_recipes = [
+            recipe for recipe in imported_recipes if recipe not in registered_recipes
+        ]
+
+        # one statement in one transaction, however long the export
+        if new_recipes and not await add_user_recipes(
+            ctx.message.author.id, new_recipes
+        ):
+            await ctx.send("Failed to import recipes.")
+            return
+
+        message = f"Imported `{len(new_recipes)}` recipes"
+        if len(new_recipes) < len(imported_recipes):
+            message += (
+                f", `{len(imported_recipes) - len(new_recipes)}` were already "
+                "registered"
+            )
+        await ctx.send(f"{message}.")
+
+        if other_profession_keys:
+            await ctx.send(
+                f"Not one of your professions: {_format_keys(other_profession_keys)}."
+            )
+
+        if unknown_keys:
+            await ctx.send(f"No recipe found for {_format_keys(unknown_keys)}.")
+
+        for key, recipe_names in ambiguous_keys.items():
+            await ctx.send(
+                f"`{key}` matches multiple recipes: {_format_keys(recipe_names)}.\nPlease add it by name."
+            )
+    except Exception as e:
+        logger.info(f"An error occurred: {e}")
+        await ctx.send("Failed to import recipes. (Something is broken)")
+
+
 @bot.command(name="remove-recipe")
 async def remove_recipe(ctx, *recipe_strs):
+    await _remove_recipes(ctx, recipe_strs)
+
+
+async def _remove_recipes(ctx, recipe_strs):
     if len(recipe_strs) == 0:
         await ctx.send("Please provide a recipe to remove.")
         return
 
     author = ctx.message.author
-    user_recipes = await get_user_recipes(author.id)
-    if not user_recipes:
+    user_context = await _load_user_context(ctx)
+    user_recipe_names = user_context["recipes"] if user_context else None
+    if not user_recipe_names:
         await ctx.send(f"No recipes registered for user `{author.display_name}`.")
         return
 
-    user_recipe_names = [recipe["recipe_name"] for recipe in user_recipes]
     matches = search(recipe_strs, user_recipe_names)
 
     if not matches:
         await ctx.send(f"No recipe found for `{', '.join(recipe_strs)}`.")
         return
     else:
-        for recipe_str, recipes in matches.items():
-            for recipe in recipes:
-                await remove_user_recipe(author.id, recipe)
-                await ctx.send(
-                    f"Removed recipe `{recipe}` for user `{author.display_name}`."
-                )
+        removed_recipes = list(
+            dict.fromkeys(recipe for recipes in matches.values() for recipe in recipes)
+        )
+        if removed_recipes:
+            await remove_user_recipes(author.id, removed_recipes)
+
+        for recipe in removed_recipes:
+            await ctx.send(
+                f"Removed recipe `{recipe}` for user `{author.display_name}`."
+            )
 
 
 @bot.command(name="search")
 async def search_recipe(ctx, *recipes):
-    all_recipe_names = [
-        recipe_name
-        for profession, recipes in profession_recipes.items()
-        for recipe_name in list(recipes.keys())
-    ]
+    await _search_recipes(ctx, recipes)
+
 
-    matches = search(recipes, all_recipe_names)
+async def _search_recipes(ctx, recipes):
+    recipe_index = catalog_snapshot.recipe_index
+    matches = search(recipes, recipe_index, limit=SEARCH_RESULT_LIMIT)
 
     if matches:
         recipe_names = [
@@ -236,8 +467,18 @@ async def search_recipe(ctx, *recipes):
             for recipe_name in recipe_names
         ]
 
-        if len(recipe_names) > 20:
-            message = f"Found recipes {', '.join([f'`{recipe_name}`' for recipe_name in recipe_names][:20])} ... and `{len(recipe_names) - 20}` more matches when searching for {', '.join([f'`{r}`' for r in recipes])}."
+        # only truncated results need the full candidate count
+        match_count = sum(
+            (
+                recipe_index.count(recipe)
+                if len(matches[recipe]) == SEARCH_RESULT_LIMIT
+                else len(matches[recipe])
+            )
+            for recipe in matches
+        )
+
+        if match_count > SEARCH_RESULT_LIMIT:
+            message = f"Found recipes {', '.join([f'`{recipe_name}`' for recipe_name in recipe_names][:SEARCH_RESULT_LIMIT])} ... and `{match_count - SEARCH_RESULT_LIMIT}` more matches when searching for {', '.join([f'`{r}`' for r in recipes])}."
         else:
             message = f"Found recipes {', '.join([f'`{recipe_name}`' for recipe_name in recipe_names])} when searching for {', '.join([f'`{r}`' for r in recipes])}."
 
@@ -254,37 +495,40 @@ async def who(ctx):
         if recipe.strip()
     ]
 
+    await _who(ctx, search_recipes)
+
+
+async def _who(ctx, search_recipes):
     if not search_recipes:
         await ctx.send("Please provide one or more recipes to search for.")
         return
 
-    user_recipes = await get_all_recipes()
-    if not user_recipes:
+    registered_recipes = await get_registered_recipe_names()
+    if not registered_recipes:
         await ctx.send(f"No recipe found for `{', '.join(search_recipes)}`.")
         return
 
-    user_recipe_names = [recipe["recipe_name"] for recipe in user_recipes]
+    registered_recipe_names = [recipe["recipe_name"] for recipe in registered_recipes]
 
-    matches = search(search_recipes, user_recipe_names)
+    matches = search(search_recipes, registered_recipe_names)
 
     # flatten the matches
-    recipe_names = [match for match_list in matches.values() for match in match_list]
+    recipe_names = list(
+        dict.fromkeys(match for match_list in matches.values() for match in match_list)
+    )
 
-    user_crafters = [
-        recipe for recipe in user_recipes if recipe["recipe_name"] in recipe_names
-    ]
-
-    recipe_user_craft_groups = {
-        recipe_name: [
-            recipe["user_name"]
-            for recipe in user_crafters
-            if recipe["recipe_name"] == recipe_name
-        ]
-        for recipe_name in {recipe["recipe_name"] for recipe in user_crafters}
-    }
+    recipe_user_craft_groups = {}
+    if recipe_names:
+        crafters = await get_recipe_crafters(recipe_names) or []
+        recipe_user_craft_groups = {
+            crafter["recipe_name"]: crafter["user_names"] for crafter in crafters
+        }
 
     if recipe_user_craft_groups:
-        for recipe_name in recipe_user_craft_groups:
+        for recipe_name in recipe_names:
+            if recipe_name not in recipe_user_craft_groups:
+                continue
+
             await ctx.send(
                 f"Users that can craft `{recipe_name}`: {', '.join([f'`{user}`' for user in recipe_user_craft_groups[recipe_name]])}"
             )
@@ -294,42 +538,158 @@ async def who(ctx):
 
 @bot.command(name="my-recipes")
 async def list_recipes(ctx):
-    user_recipes = await get_user_recipes(ctx.message.author.id)
+    user_context = await _load_user_context(ctx)
 
-    if not user_recipes:
+    if not user_context or not user_context["recipes"]:
         await ctx.send(
             f"No recipes registered for user `{ctx.message.author.display_name}`."
         )
         return
 
-    user_recipe_names: list[str] = [recipe["recipe_name"] for recipe in user_recipes]
+    user_recipe_names: list[str] = user_context["recipes"]
 
-    user_professions = await get_user_professions(ctx.message.author.id)
-    if not user_professions:
+    if not user_context["professions"]:
         await ctx.send(
             f"No professions registered for user `{ctx.message.author.display_name}`."
         )
         return
 
-    user_professions = [
-        Profession(prof["profession_name"]) for prof in user_professions
+    recipe_catalog = catalog_snapshot.catalog
+    recipe_groups: dict[Profession, list[str]] = {}
+    for user_recipe_name in user_recipe_names:
+        for recipe in recipe_catalog.all_by_name.get(user_recipe_name, ()):
+            recipe_groups.setdefault(recipe.profession, []).append(recipe.name)
+
+    # in catalog order, like the professions are listed everywhere else
+    for profession in recipe_catalog.by_profession:
+        if profession in recipe_groups:
+            await ctx.send(
+                f"`{profession.value}`: {', '.join([f'`{recipe_name}`' for recipe_name in recipe_groups[profession]])}"
+            )
+
+
+def _recipe_choices(recipe_names: list[str]) -> list[app_commands.Choice[str]]:
+    return [
+        app_commands.Choice(name=recipe_name, value=recipe_name)
+        for recipe_name in recipe_names
     ]
 
-    recipe_groups = {
-        profession.value: [
-            user_recipe_name
-            for user_recipe_name in user_recipe_names
-            if profession in profession_recipes
-            and user_recipe_name in profession_recipes[profession]
-        ]
-        for profession in profession_recipes
-    }
 
-    for profession, recipes_names in recipe_groups.items():
-        if recipes_names:
+async def _complete_any_recipe(
+    interaction: discord.Interaction, current: str
+) -> list[app_commands.Choice[str]]:
+    return _recipe_choices(catalog_snapshot.profession_recipe_trie.complete(current))
+
+
+def _own_recipe_trie(user_id: int) -> ShardedPrefixTrie:
+    profession_recipe_trie = catalog_snapshot.profession_recipe_trie
+
+    # the loaded directory knows everyone's professions, the cache only those
+    # of users seen by an earlier command
+    user_context = directory.get_user_context(user_id)
+    if user_context is not None:
+        user_professions = [Profession(prof) for prof in user_context["professions"]]
+    else:
+        user_professions = user_profession_cache.get(user_id)
+
+    # fall back to every profession until the user's are known
+    if user_professions is None:
+        return profession_recipe_trie
+
+    return profession_recipe_trie.select(user_professions)
+
+
+async def _complete_own_recipe(
+    interaction: discord.Interaction, current: str
+) -> list[app_commands.Choice[str]]:
+    return _recipe_choices(_own_recipe_trie(interaction.user.id).complete(current))
+
+
+async def _complete_registered_recipe(
+    interaction: discord.Interaction, current: str
+) -> list[app_commands.Choice[str]]:
+    # only what the user registered can be removed
+    user_context = directory.get_user_context(interaction.user.id)
+    if user_context is None:
+        return await _complete_own_recipe(interaction, current)
+
+    return _recipe_choices(complete_names(sorted(user_context["recipes"]), current))
+
+
+async def _interaction_context(interaction: discord.Interaction) -> commands.Context:
+    # acknowledged right away, the command may take longer than the 3 seconds
+    # Discord waits for a response
+    await interaction.response.defer()
+    return await commands.Context.from_interaction(interaction)
+
+
+@bot.tree.command(name="add-recipe", description="Add a recipe")
+@app_commands.describe(recipe="Recipe to add")
+@app_commands.autocomplete(recipe=_complete_own_recipe)
+async def add_recipe_slash(interaction: discord.Interaction, recipe: str):
+    ctx = await _interaction_context(interaction)
+    await _add_recipes(ctx, [recipe])
+
+
+@bot.tree.command(name="remove-recipe", description="Remove a recipe")
+@app_commands.describe(recipe="Recipe to remove")
+@app_commands.autocomplete(recipe=_complete_registered_recipe)
+async def remove_recipe_slash(interaction: discord.Interaction, recipe: str):
+    ctx = await _interaction_context(interaction)
+    await _remove_recipes(ctx, [recipe])
+
+
+@bot.tree.command(name="who", description="Display users that can craft an item")
+@app_commands.describe(recipe="Recipe to look up")
+@app_commands.autocomplete(recipe=_complete_any_recipe)
+async def who_slash(interaction: discord.Interaction, recipe: str):
+    ctx = await _interaction_context(interaction)
+    await _who(ctx, [recipe])
+
+
+@bot.tree.command(name="search", description="Search for a recipe")
+@app_commands.describe(recipe="Recipe to search for")
+@app_commands.autocomplete(recipe=_complete_any_recipe)
+async def search_slash(interaction: discord.Interaction, recipe: str):
+    ctx = await _interaction_context(interaction)
+    await _search_recipes(ctx, [recipe])
+
+
+@bot.command(name="sync")
+@commands.is_owner()
+async def sync_commands(ctx):
+    # global syncs are heavily rate limited, so they only happen on request
+    # rather than on every start
+    synced = await bot.tree.sync()
+    await ctx.send(f"Synced `{len(synced)}` slash commands.")
+
+
+@bot.command(name="reload-recipes")
+@commands.is_owner()
+async def reload_recipes(ctx):
+    global catalog_snapshot
+
+    if catalog_reload_lock.locked():
+        await ctx.send("The recipe catalog is already being reloaded.")
+        return
+
+    async with catalog_reload_lock:
+        await ctx.send("Reloading the recipe catalog...")
+
+        # built in a thread, commands keep using the current snapshot meanwhile
+        try:
+            snapshot = await asyncio.to_thread(reload_snapshot)
+        except Exception as e:
+            logger.info(f"An error occurred: {e}")
             await ctx.send(
-                f"`{profession}`: {', '.join([f'`{recipe_name}`' for recipe_name in recipes_names])}"
+                "Failed to reload the recipe catalog, the current one stays in use."
             )
+            return
+
+        await sync_recipe_catalog(_recipe_catalog_rows(snapshot.catalog))
+        catalog_snapshot = snapshot
+
+    await ctx.send(f"Reloaded the recipe catalog, `{len(snapshot.catalog)}` recipes.")
 
 
 @bot.command(name="commands")
@@ -338,12 +698,17 @@ async def list_commands(ctx):
         "Commands:\n"
         "`!who <recipe>` - Display users that can craft an item\n"
         "`!search <recipe>` - Search for a recipe\n"
-        "`!prof` - List all user professions\n"
+        "`!prof [profession]` - List all user professions, or the members of one\n"
         "`!my-prof` - List or register your professions\n"
         "`!remove-prof <profession>` - Remove one or more professions\n"
         "`!my-recipes` - List recipes that you can craft\n"
         "`!add-recipe <recipe>` - Add one or more recipes\n"
         "`!remove-recipe <recipe>` - Remove one or more recipes\n"
+        "`!import-recipes <ids or names>` - Add the recipes of an addon export, "
+        "pasted or attached\n"
+        "`!reload-recipes` - Reload the recipe catalog (bot owner only)\n"
+        "`!sync` - Register the slash commands with Discord (bot owner only)\n"
+        "`/add-recipe`, `/remove-recipe`, `/who` and `/search` autocomplete recipe names\n"
     )
 
 
@@ -354,4 +719,18 @@ async def on_command_error(ctx, error):
         await ctx.send(f"Failed to process command `{ctx.command.name}`.")
 
 
-bot.run(DISCORD_BOT_TOKEN)
+async def main():
+    await create_pool()
+
+    try:
+        # before logging in, a failed migration stops the bot instead of
+        # leaving on_ready to run against an outdated schema
+        await migrate()
+
+        async with bot:
+            await bot.start(DISCORD_BOT_TOKEN)
+    finally:
+        await close_pool()
+
+
+asyncio.run(main())
@@ -0,0 +1,396 @@
+import ast
+import hashlib
+import importlib
+import json
+import logging
+import os
+import struct
+import sys
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Iterable, Mapping
+
+from discord_bot.mapped_catalog import (
+    MappedCounts,
+    MappedPostings,
+    MappedStrings,
+    mapped_array,
+    read_mapped_catalog,
+)
+from discord_bot.profession import Profession
+from discord_bot.search import (
+    CompiledBKTree,
+    SearchIndex,
+    ShardedSearchIndex,
+    fingerprint_of,
+    normalize_query,
+)
+from discord_bot.trie import PrefixTrie, ShardedPrefixTrie
+
+logger = logging.getLogger(__name__)
+
+PACKAGE_DIR = Path(__file__).resolve().parent
+
+# written by `python -m discord_bot.catalog_compiler`, a .bin file is loaded
+# memory-mapped
+COMPILED_CATALOG_PATH = Path(
+    os.environ.get("RECIPE_CATALOG_PATH", PACKAGE_DIR / "recipe_catalog.json")
+)
+# bumped whenever the layout of the compiled catalog changes
+COMPILED_CATALOG_VERSION = 2
+
+
+class Recipe:
+    __slots__ = ("name", "normalized", "profession", "id")
+
+    def __init__(self, name: str, profession: Profession, id: int | None):
+        self.name = name
+        self.normalized = normalize_query(name)
+        self.profession = profession
+        self.id = id
+
+    def __repr__(self) -> str:
+        return f"Recipe(name={self.name!r}, profession={self.profession}, id={self.id})"
+
+
+class RecipeCatalog:
+    __slots__ = (
+        "recipes",
+        "by_name",
+        "by_normalized_name",
+        "by_id",
+        "by_profession",
+        "all_by_name",
+    )
+
+    def __init__(self, profession_recipes: Mapping[Profession, Mapping[str, int]]):
+        by_name: dict[str, Recipe] = {}
+        by_normalized_name: dict[str, Recipe] = {}
+        by_id: dict[int, tuple[Recipe, ...]] = {}
+        by_profession: dict[Profession, tuple[Recipe, ...]] = {}
+        all_by_name: dict[str, tuple[Recipe, ...]] = {}
+
+        for profession, recipes in profession_recipes.items():
+            # 0 stands for a recipe without a known id
+            records = tuple(
+                Recipe(recipe_name, profession, recipe_id or None)
+                for recipe_name, recipe_id in recipes.items()
+            )
+            by_profession[profession] = records
+
+            for recipe in records:
+                # the first profession that teaches a recipe owns it
+                by_name.setdefault(recipe.name, recipe)
+                by_normalized_name.setdefault(recipe.normalized, recipe)
+                all_by_name[recipe.name] = all_by_name.get(recipe.name, ()) + (recipe,)
+                if recipe.id is not None:
+                    by_id[recipe.id] = by_id.get(recipe.id, ()) + (recipe,)
+
+        set_field = super().__setattr__
+        set_field("recipes", tuple(by_name.values()))
+        set_field("by_name", MappingProxyType(by_name))
+        set_field("by_normalized_name", MappingProxyType(by_normalized_name))
+        # every record with an id, spells and items share some of them
+        set_field("by_id", MappingProxyType(by_id))
+        set_field("by_profession", MappingProxyType(by_profession))
+        # every profession's record of a recipe, for the few taught by several
+        set_field("all_by_name", MappingProxyType(all_by_name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RecipeCatalog is immutable")
+
+    def __len__(self) -> int:
+        return len(self.recipes)
+
+    def __contains__(self, recipe_name: str) -> bool:
+        return recipe_name in self.by_name
+
+    def lookup(
+        self, key: int | str, professions: Iterable[Profession] | None = None
+    ) -> tuple[Recipe, ...]:
+        # the records of a spell id or an exact, case-insensitive name, of the
+        # given professions only; an id can stand for several recipes
+        if isinstance(key, int):
+            recipes = self.by_id.get(key, ())
+        else:
+            recipe = self.by_normalized_name.get(normalize_query(key))
+            recipes = self.all_by_name[recipe.name] if recipe is not None else ()
+
+        if professions is not None:
+            professions = set(professions)
+            recipes = tuple(
+                recipe for recipe in recipes if recipe.profession in professions
+            )
+
+        return recipes
+
+    def names(self, profession: Profession | None = None) -> list[str]:
+        if profession is None:
+            recipes = self.recipes
+        else:
+            recipes = self.by_profession.get(profession, ())
+
+        return [recipe.name for recipe in recipes]
+
+
+def source_paths() -> list[Path]:
+    # profession_recipes.py and the modules it stitches together, found
+    # without importing them; search.py and trie.py decide how postings, word
+    # trees and completions are built
+    paths = [
+        PACKAGE_DIR / "profession_recipes.py",
+        PACKAGE_DIR / "search.py",
+        PACKAGE_DIR / "trie.py",
+    ]
+    for node in ast.parse(paths[0].read_text()).body:
+        if isinstance(node, ast.ImportFrom) and node.module.startswith("discord_bot."):
+            module_name = node.module.removeprefix("discord_bot.")
+            paths.append(PACKAGE_DIR / f"{module_name}.py")
+
+    return paths
+
+
+def _recipe_module_names() -> list[str]:
+    # the modules profession_recipes.py takes a *_recipes dict from
+    tree = ast.parse((PACKAGE_DIR / "profession_recipes.py").read_text())
+    return [
+        node.module
+        for node in tree.body
+        if isinstance(node, ast.ImportFrom)
+        and any(alias.name.endswith("_recipes") for alias in node.names)
+    ]
+
+
+def source_hash() -> str:
+    digest = hashlib.sha256()
+    for path in source_paths():
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+
+    return digest.hexdigest()
+
+
+def build_catalog() -> RecipeCatalog:
+    # imported here, a compiled catalog doesn't need the recipe modules
+    from discord_bot.profession_recipes import profession_recipes
+
+    return RecipeCatalog(profession_recipes)
+
+
+def build_search_indexes(
+    catalog: RecipeCatalog,
+) -> tuple[SearchIndex, ShardedSearchIndex]:
+    recipe_index = SearchIndex(catalog.names())
+    profession_recipe_index = ShardedSearchIndex(
+        {
+            profession: SearchIndex(catalog.names(profession))
+            for profession in catalog.by_profession
+        }
+    )
+
+    return recipe_index, profession_recipe_index
+
+
+class CatalogSnapshot:
+    # everything derived from the recipe modules, replaced as a whole on reload
+    __slots__ = (
+        "catalog",
+        "recipe_index",
+        "profession_recipe_index",
+        "profession_recipe_trie",
+    )
+
+    def __init__(
+        self,
+        catalog: RecipeCatalog,
+        recipe_index: SearchIndex,
+        profession_recipe_index: ShardedSearchIndex,
+        profession_recipe_trie: ShardedPrefixTrie | None = None,
+    ):
+        # the tries share the names, and so the positions, of the shards
+        if profession_recipe_trie is None:
+            profession_recipe_trie = ShardedPrefixTrie(
+                {
+                    profession: PrefixTrie(index.names)
+                    for profession, index in profession_recipe_index.shards.items()
+                }
+            )
+
+        set_field = super().__setattr__
+        set_field("catalog", catalog)
+        set_field("recipe_index", recipe_index)
+        set_field("profession_recipe_index", profession_recipe_index)
+        set_field("profession_recipe_trie", profession_recipe_trie)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CatalogSnapshot is immutable")
+
+
+def _is_current(compiled: dict[str, Any], path: Path) -> bool:
+    if (
+        compiled.get("version") == COMPILED_CATALOG_VERSION
+        and compiled.get("sources") == source_hash()
+    ):
+        return True
+
+    logger.info(f"The compiled recipe catalog {path} is out of date, ignoring it.")
+    return False
+
+
+def _read_json_catalog(path: Path) -> CatalogSnapshot | None:
+    compiled = json.loads(path.read_text())
+    if not _is_current(compiled, path):
+        return None
+
+    def load_index(compiled_index: dict[str, Any]) -> SearchIndex:
+        word_tree = compiled_index["word_tree"]
+        return SearchIndex(
+            compiled_index["names"],
+            postings=compiled_index["postings"],
+            token_postings=compiled_index["token_postings"],
+            vocabulary=compiled_index["vocabulary"],
+            word_tree=CompiledBKTree(
+                word_tree["words"],
+                word_tree["offsets"],
+                word_tree["distances"],
+                word_tree["child_nodes"],
+            ),
+        )
+
+    catalog = RecipeCatalog(
+        {
+            Profession(profession): dict(recipes)
+            for profession, recipes in compiled["professions"].items()
+        }
+    )
+    compiled_indexes = compiled["indexes"]
+    recipe_index = load_index(compiled_indexes["all"])
+    profession_recipe_index = ShardedSearchIndex(
+        {
+            Profession(profession): load_index(compiled_index)
+            for profession, compiled_index in compiled_indexes["professions"].items()
+        }
+    )
+    profession_recipe_trie = ShardedPrefixTrie(
+        {
+            Profession(profession): PrefixTrie(
+                profession_recipe_index.shards[Profession(profession)].names,
+                completions=completions,
+            )
+            for profession, completions in compiled["tries"].items()
+        }
+    )
+
+    return CatalogSnapshot(
+        catalog, recipe_index, profession_recipe_index, profession_recipe_trie
+    )
+
+
+def _read_mapped_catalog(path: Path) -> CatalogSnapshot | None:
+    mapped = read_mapped_catalog(path)
+    if mapped is None:
+        logger.info(f"{path} is not a compiled recipe catalog, ignoring it.")
+        return None
+
+    header, buffer = mapped
+    if not _is_current(header, path):
+        return None
+
+    # names and postings stay in the mapping until a query reads them
+    def load_index(key: str, offsets: dict[str, Any]) -> SearchIndex:
+        word_tree = offsets["word_tree"]
+        return SearchIndex(
+            MappedStrings(buffer, offsets["names"]),
+            normalized_names=MappedStrings(buffer, offsets["normalized_names"]),
+            postings=MappedPostings(buffer, offsets["postings"]),
+            token_postings=MappedPostings(buffer, offsets["token_postings"]),
+            vocabulary=MappedCounts(buffer, offsets["vocabulary"]),
+            fingerprint=fingerprint_of([header["sources"], key]),
+            word_tree=CompiledBKTree(
+                MappedStrings(buffer, word_tree["words"]),
+                mapped_array(buffer, word_tree["offsets"]),
+                mapped_array(buffer, word_tree["distances"]),
+                mapped_array(buffer, word_tree["child_nodes"]),
+            ),
+        )
+
+    # the catalog's own dicts need every name, so only these are decoded
+    catalog = RecipeCatalog(
+        {
+            Profession(profession): dict(
+                zip(
+                    MappedStrings(buffer, offsets["names"]),
+                    mapped_array(buffer, offsets["ids"]),
+                )
+            )
+            for profession, offsets in header["professions"].items()
+        }
+    )
+    indexes = header["indexes"]
+    recipe_index = load_index("all", indexes["all"])
+    profession_recipe_index = ShardedSearchIndex(
+        {
+            Profession(profession): load_index(profession, offsets)
+            for profession, offsets in indexes["professions"].items()
+        }
+    )
+    profession_recipe_trie = ShardedPrefixTrie(
+        {
+            Profession(profession): PrefixTrie(
+                profession_recipe_index.shards[Profession(profession)].names,
+                completions=MappedPostings(buffer, offsets),
+            )
+            for profession, offsets in header["tries"].items()
+        }
+    )
+
+    return CatalogSnapshot(
+        catalog, recipe_index, profession_recipe_index, profession_recipe_trie
+    )
+
+
+def read_compiled_catalog(path: Path = COMPILED_CATALOG_PATH) -> CatalogSnapshot | None:
+    try:
+        # .bin is the memory-mapped layout, anything else is JSON
+        if path.suffix == ".bin":
+            return _read_mapped_catalog(path)
+
+        return _read_json_catalog(path)
+    except FileNotFoundError:
+        return None
+    except (ValueError, KeyError, struct.error) as e:
+        # a truncated or corrupt artifact, like an outdated one, is rebuilt
+        # from the recipe modules rather than keeping the bot from starting
+        logger.info(
+            f"The compiled recipe catalog {path} is corrupt, ignoring it.\n{e}"
+        )
+        return None
+
+
+def _reload_recipe_modules():
+    # profession.py and search.py are left alone, the running bot holds on to
+    # their classes
+    for module_name in [*_recipe_module_names(), "discord_bot.profession_recipes"]:
+        module = sys.modules.get(module_name)
+        if module is not None:
+            importlib.reload(module)
+
+
+def load_snapshot() -> CatalogSnapshot:
+    snapshot = read_compiled_catalog()
+    if snapshot is not None:
+        logger.info(f"Loaded the compiled recipe catalog {COMPILED_CATALOG_PATH}.")
+        return snapshot
+
+    logger.info("Building the recipe catalog from the recipe modules...")
+    catalog = build_catalog()
+    return CatalogSnapshot(catalog, *build_search_indexes(catalog))
+
+
+def reload_snapshot() -> CatalogSnapshot:
+    # picks up edits to the recipe modules; the compiled catalog no longer
+    # matches them, so it's rebuilt unless it was recompiled as well. Runs in a
+    # worker thread: the indexes build their word trees and the tries their
+    # completions here, so nothing is left for the event loop after the swap
+    _reload_recipe_modules()
+    return load_snapshot()
@@ -0,0 +1,199 @@
+"""Checks the recipe modules and compiles them into a recipe catalog artifact.
+
+    python -m discord_bot.catalog_compiler
+    python -m discord_bot.catalog_compiler --strict --output recipe_catalog.json
+    python -m discord_bot.catalog_compiler --output recipe_catalog.bin
+
+Reports duplicate recipes, recipes without an id, names with stray whitespace
+and conflicting names or ids. With --strict any problem fails the build
+before the artifact is written.
+"""
+
+import argparse
+import ast
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any
+
+from discord_bot.catalog import (
+    COMPILED_CATALOG_PATH,
+    COMPILED_CATALOG_VERSION,
+    PACKAGE_DIR,
+    CatalogSnapshot,
+    build_catalog,
+    build_search_indexes,
+    source_hash,
+    source_paths,
+)
+from discord_bot.mapped_catalog import write_mapped_catalog
+from discord_bot.search import SearchIndex, normalize_query
+
+
+def _recipe_entries(path: Path) -> list[tuple[str, Any, int]]:
+    # (name, id, line) of every entry, including the ones a dict literal
+    # silently overwrites
+    entries = []
+    for node in ast.parse(path.read_text()).body:
+        if not (
+            isinstance(node, ast.Assign)
+            and isinstance(node.value, ast.Dict)
+            and any(
+                isinstance(target, ast.Name) and target.id.endswith("_recipes")
+                for target in node.targets
+            )
+        ):
+            continue
+
+        for key, value in zip(node.value.keys, node.value.values):
+            if isinstance(key, ast.Constant) and isinstance(value, ast.Constant):
+                entries.append((key.value, value.value, key.lineno))
+
+    return entries
+
+
+def find_problems() -> list[str]:
+    problems = []
+    # normalized name -> (name, id, location) of its first entry
+    names: dict[str, tuple[str, Any, str]] = {}
+    # id -> (name, location) of its first entry
+    ids: dict[int, tuple[str, str]] = {}
+
+    for path in source_paths():
+        entries = _recipe_entries(path)
+        module_names: dict[str, tuple[Any, int]] = {}
+        for name, recipe_id, line in entries:
+            location = f"{path.relative_to(PACKAGE_DIR.parent)}:{line}"
+
+            if name in module_names:
+                first_id, first_line = module_names[name]
+                problems.append(
+                    f"{location}: duplicate recipe {name!r}, id {recipe_id} "
+                    f"overwrites id {first_id} from line {first_line}"
+                )
+                continue
+            module_names[name] = (recipe_id, line)
+
+            if name != " ".join(name.split()):
+                problems.append(f"{location}: recipe {name!r} has stray whitespace")
+
+            if not isinstance(recipe_id, int) or recipe_id < 0:
+                problems.append(
+                    f"{location}: recipe {name!r} has bad id {recipe_id!r}"
+                )
+                continue
+
+            if recipe_id == 0:
+                problems.append(f"{location}: recipe {name!r} has no id")
+            elif recipe_id in ids and ids[recipe_id][0] != name:
+                first_name, first_location = ids[recipe_id]
+                problems.append(
+                    f"{location}: id {recipe_id} of {name!r} is already used "
+                    f"by {first_name!r} at {first_location}"
+                )
+            else:
+                ids.setdefault(recipe_id, (name, location))
+
+            # another profession teaching the same recipe is fine, a
+            # different id or spelling for it isn't
+            normalized = normalize_query(name)
+            if normalized in names:
+                first_name, first_id, first_location = names[normalized]
+                if first_name != name or first_id not in (recipe_id, 0):
+                    problems.append(
+                        f"{location}: recipe {name!r} ({recipe_id}) conflicts "
+                        f"with {first_name!r} ({first_id}) at {first_location}"
+                    )
+            else:
+                names[normalized] = (name, recipe_id, location)
+
+    return problems
+
+
+def _compile_search_index(index: SearchIndex) -> dict[str, Any]:
+    offsets, distances, child_nodes = index.word_tree.edges()
+    return {
+        "names": index.names,
+        "postings": index.postings,
+        "token_postings": index.token_postings,
+        "vocabulary": index.vocabulary,
+        "word_tree": {
+            "words": index.word_tree.words,
+            "offsets": offsets,
+            "distances": distances,
+            "child_nodes": child_nodes,
+        },
+    }
+
+
+def compile_catalog() -> dict[str, Any]:
+    catalog = build_catalog()
+    snapshot = CatalogSnapshot(catalog, *build_search_indexes(catalog))
+    recipe_index = snapshot.recipe_index
+    profession_recipe_index = snapshot.profession_recipe_index
+
+    return {
+        "version": COMPILED_CATALOG_VERSION,
+        "sources": source_hash(),
+        # raw ids, 0 included, so loading yields the very same catalog
+        "professions": {
+            profession.value: [[recipe.name, recipe.id or 0] for recipe in recipes]
+            for profession, recipes in catalog.by_profession.items()
+        },
+        "indexes": {
+            "all": _compile_search_index(recipe_index),
+            "professions": {
+                profession.value: _compile_search_index(index)
+                for profession, index in profession_recipe_index.shards.items()
+            },
+        },
+        # positions into the names of the matching profession index
+        "tries": {
+            profession.value: trie.completions
+            for profession, trie in snapshot.profession_recipe_trie.shards.items()
+        },
+    }
+
+
+def write_compiled_catalog(path: Path, compiled: dict[str, Any]):
+    if path.suffix == ".bin":
+        write_mapped_catalog(path, compiled)
+        return
+
+    # replaced whole, a bot starting meanwhile never reads half a file
+    temporary_path = path.with_name(f"{path.name}.tmp")
+    temporary_path.write_text(json.dumps(compiled, separators=(",", ":")))
+    os.replace(temporary_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--output",
+        type=Path,
+        action="append",
+        help="JSON, or the memory-mapped layout for a .bin file; repeatable",
+    )
+    parser.add_argument(
+        "--strict", action="store_true", help="fail when there are problems"
+    )
+    args = parser.parse_args()
+
+    problems = find_problems()
+    for problem in problems:
+        print(problem, file=sys.stderr)
+
+    if problems:
+        print(f"{len(problems)} problems in the recipe modules.", file=sys.stderr)
+        if args.strict:
+            sys.exit(1)
+
+    compiled = compile_catalog()
+    for output in args.output or [COMPILED_CATALOG_PATH]:
+        write_compiled_catalog(output, compiled)
+        print(f"Compiled the recipe catalog to {output}.")
+
+
+if __name__ == "__main__":
+    main()
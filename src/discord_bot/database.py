@@ -1,8 +1,12 @@
+import asyncio
+import json
 import logging
 import os
+import uuid
 from typing import Any
 import asyncpg
 
+from discord_bot.directory import directory
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +21,174 @@ DATABASE_CONNECTION_PARAMS = {
     "ssl": os.environ.get("POSTGRES_SSL"),
 }
 
+DATABASE_POOL_PARAMS = {
+    "min_size": int(os.environ.get("POSTGRES_POOL_MIN_SIZE", 1)),
+    "max_size": int(os.environ.get("POSTGRES_POOL_MAX_SIZE", 10)),
+    # seconds an idle connection is kept open before it is closed
+    "max_inactive_connection_lifetime": float(
+        os.environ.get("POSTGRES_POOL_MAX_INACTIVE_CONNECTION_LIFETIME", 300.0)
+    ),
+    # every pooled connection keeps the statements it has prepared, keyed by
+    # query text, so the fixed queries below are parsed and planned only once
+    "statement_cache_size": int(os.environ.get("POSTGRES_STATEMENT_CACHE_SIZE", 100)),
+    "max_cached_statement_lifetime": float(
+        os.environ.get("POSTGRES_MAX_CACHED_STATEMENT_LIFETIME", 3600.0)
+    ),
+}
+
+# every process patches its directory from the changes the others announce here
+NOTIFY_CHANNEL = "discord_bot_directory"
+# payloads have to stay below 8000 bytes
+NOTIFY_PAYLOAD_LIMIT = 7900
+# tells this process' own notifications apart from the others'
+NOTIFY_ORIGIN = uuid.uuid4().hex
+
+# what a lost connection or an unreachable server raises; the background
+# loops log these and retry on their next iteration instead of dying, e.g.
+# ConnectionDoesNotExistError is an InterfaceError, not a PostgresError
+CONNECTION_ERRORS = (asyncpg.PostgresError, asyncpg.InterfaceError, OSError)
+
+# the queries behind !who and !prof, tests/test_query_plans.py checks
+# their plans
+RECIPE_CRAFTERS_QUERY = """
+    SELECT recipe_name, array_agg(user_name ORDER BY user_name) AS user_names
+    FROM recipe_catalog
+    JOIN recipes USING (recipe_id)
+    JOIN users USING (user_id)
+    WHERE recipe_name = ANY($1::varchar[])
+    GROUP BY recipe_name
+"""
+PROFESSION_MEMBERS_QUERY = """
+    SELECT profession_name, array_agg(user_name ORDER BY user_name) AS user_names
+    FROM professions
+    JOIN users USING (user_id)
+    WHERE profession_name = ANY($1::varchar[])
+    GROUP BY profession_name
+    ORDER BY profession_name
+"""
+ALL_PROFESSION_MEMBERS_QUERY = """
+    SELECT profession_name, array_agg(user_name ORDER BY user_name) AS user_names
+    FROM professions
+    JOIN users USING (user_id)
+    GROUP BY profession_name
+    ORDER BY profession_name
+"""
+
+_pool: asyncpg.Pool | None = None
+_listener: asyncpg.Connection | None = None
+_reload: asyncio.Task | None = None
+
+
+async def create_pool():
+    global _pool
+
+    if _pool is not None:
+        return
+
+    logger.info(
+        f"Creating database connection pool with the following parameters: {DATABASE_POOL_PARAMS}"
+    )
+    _pool = await asyncpg.create_pool(
+        **DATABASE_CONNECTION_PARAMS, **DATABASE_POOL_PARAMS
+    )
+
+
+async def close_pool():
+    global _pool
+
+    if _pool is None:
+        return
+
+    await _stop_listening()
+
+    logger.info("Closing database connection pool...")
+    pool, _pool = _pool, None
+    await pool.close()
+
+
+def _acquire():
+    if _pool is None:
+        raise RuntimeError("Database connection pool has not been created.")
+
+    return _pool.acquire()
+
+
+async def _notify(
+    conn: asyncpg.Connection, table: str, op: str, user_id: int, keys: list[str]
+):
+    change = {
+        "origin": NOTIFY_ORIGIN,
+        "table": table,
+        "op": op,
+        "user_id": user_id,
+        "keys": keys,
+    }
+    payload = json.dumps(change)
+
+    # too many keys to send, the listeners reload everything instead
+    if len(payload.encode()) > NOTIFY_PAYLOAD_LIMIT:
+        payload = json.dumps({**change, "keys": None})
+
+    # delivered when, and only if, the surrounding transaction commits
+    await conn.execute("SELECT pg_notify($1, $2)", NOTIFY_CHANNEL, payload)
+
+
+def _on_notification(conn, pid, channel, payload):
+    global _reload
+
+    change = json.loads(payload)
+
+    # this process has already written its own changes through
+    if change["origin"] == NOTIFY_ORIGIN:
+        return
+
+    if change["keys"] is None:
+        directory.invalidate()
+        if _reload is None or _reload.done():
+            _reload = asyncio.get_running_loop().create_task(load_directory())
+        return
+
+    directory.apply(change["table"], change["op"], change["user_id"], change["keys"])
+
+
+def _on_listener_terminated(conn):
+    global _listener
+
+    # changes made while nobody listens would be missed, so nothing is served
+    # from memory until the listener is back and the directory is reloaded
+    logger.info("Lost the database notification listener.")
+    _listener = None
+    directory.invalidate()
+
+
+async def listen_for_changes():
+    global _listener
+
+    if _listener is not None and not _listener.is_closed():
+        return
+
+    logger.info(f"Listening for directory changes on {NOTIFY_CHANNEL}...")
+
+    try:
+        # a connection of its own, pooled connections are reset when released
+        _listener = await asyncpg.connect(**DATABASE_CONNECTION_PARAMS)
+        _listener.add_termination_listener(_on_listener_terminated)
+        await _listener.add_listener(NOTIFY_CHANNEL, _on_notification)
+
+    except CONNECTION_ERRORS as e:
+        logger.info(f"An error occurred: {e}")
+
+
+async def _stop_listening():
+    global _listener
+
+    if _listener is None:
+        return
+
+    listener, _listener = _listener, None
+    listener.remove_termination_listener(_on_listener_terminated)
+    await listener.close()
+
 
 async def validate_connection():
     try:
@@ -28,10 +200,8 @@ async def validate_connection():
         logger.info(
             f"Connecting to the database using the following parameters: {params}"
         )
-        # Establish the connection
-        conn = await asyncpg.connect(**DATABASE_CONNECTION_PARAMS)
-
-        try:
+        # Acquire a connection from the pool
+        async with _acquire() as conn:
             # Define the insert query and the data to be inserted
             query = """
                 SELECT * FROM users
@@ -41,9 +211,6 @@ async def validate_connection():
             await conn.fetch(query)
 
             logger.info("Connection to the database was successful.")
-        finally:
-            # Close the connection
-            await conn.close()
     except asyncpg.PostgresError as e:
         logger.info(f"An error occurred while trying to connect to the database.\n{e}")
 
@@ -52,10 +219,8 @@ async def add_user(user_id: int, user_name: str):
     logger.info(f"Adding user {user_name} with ID {user_id} to the database...")
 
     try:
-        # Establish the connection
-        conn = await asyncpg.connect(**DATABASE_CONNECTION_PARAMS)
-
-        try:
+        # Acquire a connection from the pool
+        async with _acquire() as conn:
             # Define the insert query and the data to be inserted
             upsert_query = """
                 INSERT INTO users (user_id, user_name) VALUES ($1, $2)
@@ -65,27 +230,74 @@ async def add_user(user_id: int, user_name: str):
             upsert_data = (user_id, user_name)
 
             # Execute the insert query
-            await conn.execute(upsert_query, *upsert_data)
+            async with conn.transaction():
+                await conn.execute(upsert_query, *upsert_data)
+                await _notify(conn, "users", "add", user_id, [user_name])
+            directory.set_user(user_id, user_name)
 
             logger.info(
                 f"User {user_name} with ID {user_id} was added to the database."
             )
-        finally:
-            # Close the connection
-            await conn.close()
 
     except asyncpg.PostgresError as e:
         logger.info(f"An error occurred: {e}")
 
 
+async def update_user_names(users: list[tuple[int, str]]) -> bool:
+    # False when the names couldn't be written, so the caller can retry them
+    # names the directory already has don't need a round trip
+    if directory.loaded:
+        users = [
+            (user_id, user_name)
+            for user_id, user_name in users
+            if user_id in directory.user_names
+            and directory.user_names[user_id] != user_name
+        ]
+
+    if not users:
+        return True
+
+    logger.info(f"Updating the names of {len(users)} users in the database...")
+
+    try:
+        # Acquire a connection from the pool
+        async with _acquire() as conn:
+            # Define the insert query and the data to be inserted
+            # unknown users are left alone, unchanged rows aren't rewritten
+            update_query = """
+                UPDATE users
+                SET user_name = changes.user_name
+                FROM unnest($1::bigint[], $2::varchar[]) AS changes (user_id, user_name)
+                WHERE users.user_id = changes.user_id
+                AND users.user_name IS DISTINCT FROM changes.user_name
+                RETURNING users.user_id, users.user_name
+            """
+            update_data = tuple(map(list, zip(*users)))
+
+            # Execute the insert query
+            async with conn.transaction():
+                updated = await conn.fetch(update_query, *update_data)
+                for user in updated:
+                    await _notify(
+                        conn, "users", "add", user["user_id"], [user["user_name"]]
+                    )
+            for user in updated:
+                directory.set_user(user["user_id"], user["user_name"])
+
+            logger.info(f"The names of {len(updated)} users were updated.")
+            return True
+
+    except CONNECTION_ERRORS as e:
+        logger.info(f"An error occurred: {e}")
+        return False
+
+
 async def add_profession(user_id: int, profession: str):
     logger.info(f"Adding profession {profession} for user {user_id} to the database...")
 
     try:
-        # Establish the connection
-        conn = await asyncpg.connect(**DATABASE_CONNECTION_PARAMS)
-
-        try:
+        # Acquire a connection from the pool
+        async with _acquire() as conn:
             # Define the insert query and the data to be inserted
             upsert_query = """
                 INSERT INTO professions (user_id, profession_name)
@@ -95,14 +307,14 @@ async def add_profession(user_id: int, profession: str):
             upsert_data = (user_id, profession)
 
             # Execute the insert query
-            await conn.execute(upsert_query, *upsert_data)
+            async with conn.transaction():
+                await conn.execute(upsert_query, *upsert_data)
+                await _notify(conn, "professions", "add", user_id, [profession])
+            directory.add_profession(user_id, profession)
 
             logger.info(
                 f"Profession {profession} for user {user_id} was added to the database."
             )
-        finally:
-            # Close the connection
-            await conn.close()
 
     except asyncpg.PostgresError as e:
         logger.info(f"An error occurred: {e}")
@@ -114,10 +326,8 @@ async def remove_profession(user_id: int, profession: str):
     )
 
     try:
-        # Establish the connection
-        conn = await asyncpg.connect(**DATABASE_CONNECTION_PARAMS)
-
-        try:
+        # Acquire a connection from the pool
+        async with _acquire() as conn:
             # Define the insert query and the data to be inserted
             query = """
                 DELETE FROM professions WHERE user_id = $1 AND profession_name = $2
@@ -125,181 +335,292 @@ async def remove_profession(user_id: int, profession: str):
             data = (user_id, profession)
 
             # Execute the insert query
-            await conn.execute(query, *data)
+            async with conn.transaction():
+                await conn.execute(query, *data)
+                await _notify(conn, "professions", "remove", user_id, [profession])
+            directory.remove_profession(user_id, profession)
 
             logger.info(
                 f"Profession {profession} for user {user_id} was removed from the database."
             )
-        finally:
-            # Close the connection
-            await conn.close()
 
     except asyncpg.PostgresError as e:
         logger.info(f"An error occurred: {e}")
 
 
-async def get_user_professions(user_id: int) -> list[dict] | None:
-    logger.info(f"Getting professions for user {user_id} from the database...")
+async def load_user_context(user_id: int) -> dict[str, Any] | None:
+    context = directory.get_user_context(user_id)
+    if context is not None:
+        return context
 
-    try:
-        # Establish the connection
-        conn = await asyncpg.connect(**DATABASE_CONNECTION_PARAMS)
+    logger.info(f"Getting the context of user {user_id} from the database...")
 
-        try:
+    try:
+        # Acquire a connection from the pool
+        async with _acquire() as conn:
             # Define the insert query and the data to be inserted
+            # name, professions and recipes of the user in a single round trip
             query = """
-                SELECT profession_name FROM professions WHERE user_id = $1
+                SELECT
+                    (SELECT user_name FROM users WHERE user_id = $1) AS user_name,
+                    ARRAY(
+                        SELECT profession_name FROM professions
+                        WHERE user_id = $1
+                        ORDER BY profession_name
+                    ) AS professions,
+                    ARRAY(
+                        SELECT recipe_name
+                        FROM recipes
+                        JOIN recipe_catalog USING (recipe_id)
+                        WHERE user_id = $1
+                    ) AS recipes
             """
             data = (user_id,)
 
             # Execute the insert query
-            professions = await conn.fetch(query, *data)
+            context = await conn.fetchrow(query, *data)
 
             logger.info(
-                f"Professions for user {user_id} were retrieved from the database."
+                f"The context of user {user_id} was retrieved from the database."
             )
-            return professions
-        finally:
-            # Close the connection
-            await conn.close()
+            return context
 
     except asyncpg.PostgresError as e:
         logger.info(f"An error occurred: {e}")
 
 
-async def get_all_professions() -> list[dict] | None:
-    logger.info(f"Getting all professions from the database...")
+async def get_profession_members(
+    professions: list[str] | None = None,
+) -> list[dict] | None:
+    members = directory.get_profession_members(professions)
+    if members is not None:
+        return members
 
-    try:
-        # Establish the connection
-        conn = await asyncpg.connect(**DATABASE_CONNECTION_PARAMS)
+    logger.info(f"Getting members of professions {professions} from the database...")
 
-        try:
+    try:
+        # Acquire a connection from the pool
+        async with _acquire() as conn:
             # Define the insert query and the data to be inserted
-            query = """
-                SELECT user_id, user_name, profession_name
-                FROM professions
-                JOIN users USING (user_id)
-            """
+            if professions is None:
+                query = ALL_PROFESSION_MEMBERS_QUERY
+                data = ()
+            else:
+                # a separate statement, so its plan can use the profession index
+                query = PROFESSION_MEMBERS_QUERY
+                data = (professions,)
 
             # Execute the insert query
-            professions = await conn.fetch(query)
+            members = await conn.fetch(query, *data)
 
-            logger.info(f"All professions were retrieved from the database.")
-            return professions
-        finally:
-            # Close the connection
-            await conn.close()
+            logger.info(
+                f"Members of professions {professions} were retrieved from the database."
+            )
+            return members
 
     except asyncpg.PostgresError as e:
         logger.info(f"An error occurred: {e}")
 
 
-async def add_user_recipe(user_id: int, recipe: str):
-    logger.info(f"Adding recipe {recipe} for user {user_id} to the database...")
-
-    # try:
-    # Establish the connection
-    conn = await asyncpg.connect(**DATABASE_CONNECTION_PARAMS)
+async def add_user_recipes(user_id: int, recipes: list[str]) -> bool:
+    # False when the recipes couldn't be written, so the caller doesn't report
+    # them as added
+    logger.info(f"Adding recipes {recipes} for user {user_id} to the database...")
 
     try:
-        # Define the insert query and the data to be inserted
-        upsert_query = """
-            INSERT INTO recipes (user_id, recipe_name)
-            VALUES ($1, $2)
-            ON CONFLICT (user_id, recipe_name) DO NOTHING
-        """
-        upsert_data = (user_id, recipe)
+        # Acquire a connection from the pool
+        async with _acquire() as conn:
+            # Define the insert query and the data to be inserted
+            # names missing from the catalog are added to it on the way
+            upsert_query = """
+                WITH new_recipes AS (
+                    INSERT INTO recipe_catalog (recipe_name)
+                    SELECT unnest($2::varchar[])
+                    ON CONFLICT (recipe_name) DO NOTHING
+                    RETURNING recipe_id
+                )
+                INSERT INTO recipes (user_id, recipe_id)
+                SELECT $1::bigint, recipe_id FROM new_recipes
+                UNION
+                SELECT $1::bigint, recipe_id FROM recipe_catalog
+                WHERE recipe_name = ANY($2::varchar[])
+                ON CONFLICT (user_id, recipe_id) DO NOTHING
+            """
+            upsert_data = (user_id, recipes)
 
-        # Execute the insert query
-        await conn.execute(upsert_query, *upsert_data)
+            # Execute the insert query
+            async with conn.transaction():
+                await conn.execute(upsert_query, *upsert_data)
+                await _notify(conn, "recipes", "add", user_id, recipes)
+            directory.add_recipes(user_id, recipes)
 
-        logger.info(f"Recipe {recipe} for user {user_id} was added to the database.")
-    finally:
-        # Close the connection
-        await conn.close()
+            logger.info(
+                f"Recipes {recipes} for user {user_id} were added to the database."
+            )
+            return True
 
+    except asyncpg.PostgresError as e:
+        logger.info(f"An error occurred: {e}")
+        return False
 
-async def get_user_recipes(user_id: int) -> list[dict[str, Any]] | None:
-    logger.info(f"Getting recipes for user {user_id} from the database...")
 
-    try:
-        # Establish the connection
-        conn = await asyncpg.connect(**DATABASE_CONNECTION_PARAMS)
+async def remove_user_recipes(user_id: int, recipes: list[str]):
+    logger.info(
+        f"Removing recipes {recipes} for user {user_id} from the database..."
+    )
 
-        try:
+    try:
+        # Acquire a connection from the pool
+        async with _acquire() as conn:
             # Define the insert query and the data to be inserted
             query = """
-                SELECT recipe_name FROM recipes WHERE user_id = $1
+                DELETE FROM recipes
+                USING recipe_catalog
+                WHERE recipes.recipe_id = recipe_catalog.recipe_id
+                AND recipes.user_id = $1
+                AND recipe_catalog.recipe_name = ANY($2::varchar[])
             """
-            data = (user_id,)
+            data = (user_id, recipes)
 
             # Execute the insert query
-            recipes = await conn.fetch(query, *data)
+            async with conn.transaction():
+                await conn.execute(query, *data)
+                await _notify(conn, "recipes", "remove", user_id, recipes)
+            directory.remove_recipes(user_id, recipes)
 
-            logger.info(f"Recipes for user {user_id} were retrieved from the database.")
-            return recipes
-        finally:
-            # Close the connection
-            await conn.close()
+            logger.info(
+                f"Recipes {recipes} for user {user_id} were removed from the database."
+            )
 
     except asyncpg.PostgresError as e:
         logger.info(f"An error occurred: {e}")
 
 
-async def remove_user_recipe(user_id: int, recipe: str):
-    logger.info(f"Removing recipe {recipe} for user {user_id} from the database...")
+async def get_registered_recipe_names() -> list[dict] | None:
+    recipes = directory.get_registered_recipe_names()
+    if recipes is not None:
+        return recipes
 
+    logger.info(f"Getting registered recipe names from the database...")
     try:
-        # Establish the connection
-        conn = await asyncpg.connect(**DATABASE_CONNECTION_PARAMS)
-
-        try:
+        # Acquire a connection from the pool
+        async with _acquire() as conn:
             # Define the insert query and the data to be inserted
             query = """
-                DELETE FROM recipes WHERE user_id = $1 AND recipe_name = $2
+                SELECT recipe_name
+                FROM recipe_catalog
+                WHERE EXISTS (
+                    SELECT 1 FROM recipes WHERE recipes.recipe_id = recipe_catalog.recipe_id
+                )
             """
-            data = (user_id, recipe)
 
             # Execute the insert query
-            await conn.execute(query, *data)
+            recipes = await conn.fetch(query)
 
-            logger.info(
-                f"Recipe {recipe} for user {user_id} was removed from the database."
-            )
-        finally:
-            # Close the connection
-            await conn.close()
+            logger.info(f"Registered recipe names were retrieved from the database.")
+            return recipes
 
     except asyncpg.PostgresError as e:
         logger.info(f"An error occurred: {e}")
 
 
-async def get_all_recipes() -> list[dict] | None:
-    logger.info(f"Getting all recipes from the database...")
+async def get_recipe_crafters(recipes: list[str]) -> list[dict] | None:
+    crafters = directory.get_recipe_crafters(recipes)
+    if crafters is not None:
+        return crafters
+
+    logger.info(f"Getting crafters of recipes {recipes} from the database...")
     try:
-        # Establish the connection
-        conn = await asyncpg.connect(**DATABASE_CONNECTION_PARAMS)
+        # Acquire a connection from the pool
+        async with _acquire() as conn:
+            # Define the insert query and the data to be inserted
+            query = RECIPE_CRAFTERS_QUERY
+            data = (recipes,)
+
+            # Execute the insert query
+            crafters = await conn.fetch(query, *data)
+
+            logger.info(f"Crafters of recipes {recipes} were retrieved from the database.")
+            return crafters
+
+    except asyncpg.PostgresError as e:
+        logger.info(f"An error occurred: {e}")
+
 
-        try:
+async def sync_recipe_catalog(recipes: list[tuple[str, str, int | None]]):
+    logger.info(f"Syncing {len(recipes)} recipes to the recipe catalog...")
+
+    try:
+        # Acquire a connection from the pool
+        async with _acquire() as conn:
             # Define the insert query and the data to be inserted
-            query = """
-                SELECT user_id, user_name, recipe_name
-                FROM recipes
-                JOIN users USING (user_id)
+            upsert_query = """
+                INSERT INTO recipe_catalog (recipe_name, profession_name, spell_id)
+                SELECT * FROM unnest($1::varchar[], $2::varchar[], $3::integer[])
+                ON CONFLICT (recipe_name) DO UPDATE
+                SET profession_name = EXCLUDED.profession_name,
+                    spell_id = EXCLUDED.spell_id
+                WHERE (recipe_catalog.profession_name, recipe_catalog.spell_id)
+                    IS DISTINCT FROM (EXCLUDED.profession_name, EXCLUDED.spell_id)
             """
+            upsert_data = tuple(map(list, zip(*recipes))) if recipes else ([], [], [])
 
             # Execute the insert query
-            recipes = await conn.fetch(query)
+            await conn.execute(upsert_query, *upsert_data)
 
-            logger.info(f"All recipes were retrieved from the database.")
-            return recipes
-        finally:
-            # Close the connection
-            await conn.close()
+            logger.info("The recipe catalog was synced.")
 
     except asyncpg.PostgresError as e:
         logger.info(f"An error occurred: {e}")
 
-    # except asyncpg.PostgresError as e:
-    #     logger.info(f"An error occurred: {e}")
+
+async def load_directory():
+    logger.info("Loading the crafter directory from the database...")
+
+    # without a listener the changes of other processes would go unnoticed
+    if _listener is None or _listener.is_closed():
+        logger.info("Not listening for directory changes, not loading it.")
+        directory.invalidate()
+        return
+
+    try:
+        # Acquire a connection from the pool
+        async with _acquire() as conn:
+            version = directory.version
+
+            users_query = """
+                SELECT user_id, user_name FROM users
+            """
+            professions_query = """
+                SELECT user_id, profession_name FROM professions
+            """
+            recipes_query = """
+                SELECT user_id, recipe_name
+                FROM recipes
+                JOIN recipe_catalog USING (recipe_id)
+            """
+
+            # one snapshot for all three tables
+            async with conn.transaction(isolation="repeatable_read", readonly=True):
+                users = await conn.fetch(users_query)
+                professions = await conn.fetch(professions_query)
+                recipes = await conn.fetch(recipes_query)
+
+            # a change landed meanwhile and may be missing from the snapshot,
+            # the next reconciliation picks it up
+            if directory.version != version:
+                logger.info("The crafter directory changed while loading, skipped.")
+                return
+
+            stale_entries = directory.load(
+                [tuple(user) for user in users],
+                [tuple(profession) for profession in professions],
+                [tuple(recipe) for recipe in recipes],
+            )
+
+            logger.info(
+                f"The crafter directory was loaded, {stale_entries} stale entries: {directory}"
+            )
+
+    except CONNECTION_ERRORS as e:
+        logger.info(f"An error occurred: {e}")
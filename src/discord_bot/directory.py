@@ -0,0 +1,231 @@
+import os
+import time
+from collections import defaultdict
+from typing import Iterable
+
+# seconds between two reconciliations of the directory with the database
+DIRECTORY_RECONCILE_INTERVAL = float(
+    os.environ.get("DIRECTORY_RECONCILE_INTERVAL", 300.0)
+)
+
+
+def _sorted_names(names: Iterable[str]) -> list[str]:
+    # close enough to the database collation for display purposes
+    return sorted(names, key=str.casefold)
+
+
+class CrafterDirectory:
+    def __init__(self):
+        self.loaded = False
+        self.loaded_at: float | None = None
+        # bumped by every change, so a load can tell it raced one
+        self.version = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.reconciliations = 0
+        self.stale_entries = 0
+
+        self.user_names: dict[int, str] = {}
+        self.user_professions: dict[int, set[str]] = defaultdict(set)
+        self.user_recipes: dict[int, set[str]] = defaultdict(set)
+        self.profession_members: dict[str, set[int]] = defaultdict(set)
+        self.recipe_crafters: dict[str, set[int]] = defaultdict(set)
+
+    def __repr__(self) -> str:
+        return (
+            f"CrafterDirectory(users={len(self.user_names)}, "
+            f"recipes={len(self.recipe_crafters)}, hits={self.hits}, "
+            f"misses={self.misses}, hit_rate={self.hit_rate:.2f}, "
+            f"age={self.age:.0f}s, reconciliations={self.reconciliations}, "
+            f"stale_entries={self.stale_entries})"
+        )
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @property
+    def age(self) -> float:
+        if self.loaded_at is None:
+            return 0.0
+
+        return time.monotonic() - self.loaded_at
+
+    def _entries(self) -> set[tuple]:
+        return (
+            {("user", user_id, name) for user_id, name in self.user_names.items()}
+            | {
+                ("profession", user_id, profession)
+                for user_id, professions in self.user_professions.items()
+                for profession in professions
+            }
+            | {
+                ("recipe", user_id, recipe)
+                for user_id, recipes in self.user_recipes.items()
+                for recipe in recipes
+            }
+        )
+
+    def load(
+        self,
+        users: Iterable[tuple[int, str]],
+        professions: Iterable[tuple[int, str]],
+        recipes: Iterable[tuple[int, str]],
+    ) -> int:
+        previous_entries = self._entries() if self.loaded_at is not None else None
+
+        self.user_names = dict(users)
+        self.user_professions = defaultdict(set)
+        self.user_recipes = defaultdict(set)
+        self.profession_members = defaultdict(set)
+        self.recipe_crafters = defaultdict(set)
+
+        for user_id, profession in professions:
+            self.user_professions[user_id].add(profession)
+            self.profession_members[profession].add(user_id)
+
+        for user_id, recipe in recipes:
+            self.user_recipes[user_id].add(recipe)
+            self.recipe_crafters[recipe].add(user_id)
+
+        self.loaded = True
+        self.loaded_at = time.monotonic()
+
+        # entries that drifted from the database since the last load
+        if previous_entries is None:
+            return 0
+
+        stale_entries = len(previous_entries ^ self._entries())
+        self.reconciliations += 1
+        self.stale_entries += stale_entries
+        return stale_entries
+
+    def _lookup(self) -> bool:
+        if self.loaded:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+        return self.loaded
+
+    def invalidate(self):
+        self.loaded = False
+
+    # write-through from the database mutators, after their statements succeed
+
+    def set_user(self, user_id: int, user_name: str):
+        self.version += 1
+        self.user_names[user_id] = user_name
+
+    def add_profession(self, user_id: int, profession: str):
+        self.version += 1
+        self.user_professions[user_id].add(profession)
+        self.profession_members[profession].add(user_id)
+
+    def remove_profession(self, user_id: int, profession: str):
+        self.version += 1
+        self.user_professions.get(user_id, set()).discard(profession)
+        self.profession_members.get(profession, set()).discard(user_id)
+
+    def add_recipes(self, user_id: int, recipes: Iterable[str]):
+        self.version += 1
+        for recipe in recipes:
+            self.user_recipes[user_id].add(recipe)
+            self.recipe_crafters[recipe].add(user_id)
+
+    def remove_recipes(self, user_id: int, recipes: Iterable[str]):
+        self.version += 1
+        for recipe in recipes:
+            self.user_recipes.get(user_id, set()).discard(recipe)
+            crafters = self.recipe_crafters.get(recipe)
+            if crafters is not None:
+                crafters.discard(user_id)
+                if not crafters:
+                    del self.recipe_crafters[recipe]
+
+    # changes announced by other processes
+
+    def apply(self, table: str, op: str, user_id: int, keys: list[str]):
+        if table == "users":
+            for user_name in keys:
+                self.set_user(user_id, user_name)
+        elif table == "professions":
+            for profession in keys:
+                if op == "add":
+                    self.add_profession(user_id, profession)
+                else:
+                    self.remove_profession(user_id, profession)
+        elif table == "recipes":
+            if op == "add":
+                self.add_recipes(user_id, keys)
+            else:
+                self.remove_recipes(user_id, keys)
+
+    # reads, shaped like the rows of the matching database queries; None means
+    # the directory isn't loaded and the caller has to ask the database
+
+    def get_user_context(self, user_id: int) -> dict | None:
+        if not self._lookup():
+            return None
+
+        return {
+            "user_name": self.user_names.get(user_id),
+            "professions": sorted(self.user_professions.get(user_id, ())),
+            "recipes": list(self.user_recipes.get(user_id, ())),
+        }
+
+    def get_profession_members(
+        self, professions: list[str] | None = None
+    ) -> list[dict] | None:
+        if not self._lookup():
+            return None
+
+        if professions is None:
+            professions = list(self.profession_members)
+
+        # like the join with users, members without a name are left out
+        groups = []
+        for profession in sorted(set(professions)):
+            user_names = [
+                self.user_names[user_id]
+                for user_id in self.profession_members.get(profession, ())
+                if user_id in self.user_names
+            ]
+            if user_names:
+                groups.append(
+                    {
+                        "profession_name": profession,
+                        "user_names": _sorted_names(user_names),
+                    }
+                )
+
+        return groups
+
+    def get_registered_recipe_names(self) -> list[dict] | None:
+        if not self._lookup():
+            return None
+
+        return [{"recipe_name": recipe} for recipe in self.recipe_crafters]
+
+    def get_recipe_crafters(self, recipes: list[str]) -> list[dict] | None:
+        if not self._lookup():
+            return None
+
+        crafters = []
+        for recipe in dict.fromkeys(recipes):
+            user_names = [
+                self.user_names[user_id]
+                for user_id in self.recipe_crafters.get(recipe, ())
+                if user_id in self.user_names
+            ]
+            if user_names:
+                crafters.append(
+                    {"recipe_name": recipe, "user_names": _sorted_names(user_names)}
+                )
+
+        return crafters
+
+
+directory = CrafterDirectory()
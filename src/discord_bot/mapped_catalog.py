@@ -0,0 +1,246 @@
+"""Memory-mapped binary layout of a compiled recipe catalog.
+
+The file starts with MAGIC, the length of a JSON header and the header
+itself, which holds the offsets of the sections that follow. Sections are
+4-byte aligned and built from three shapes:
+
+- strings: count, count + 1 offsets and the UTF-8 blob they point into
+- array: count and that many unsigned 32-bit integers
+- postings: sorted keys as strings, count + 1 offsets into a positions array;
+  also the completions of every trie prefix
+
+Strings and posting arrays are read straight from the mapping when a query
+needs them, nothing is decoded up front.
+"""
+
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from pathlib import Path
+from typing import Any
+
+MAGIC = b"RCATALOG"
+
+
+def _pad(data: bytearray):
+    data.extend(b"\0" * (-len(data) % 4))
+
+
+def _pack_array(values: Iterable[int]) -> bytes:
+    values = array("I", values)
+    return struct.pack("=I", len(values)) + values.tobytes()
+
+
+def _pack_strings(values: Sequence[str]) -> bytes:
+    encoded = [value.encode() for value in values]
+
+    offsets = [0]
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+
+    return (
+        struct.pack("=I", len(encoded))
+        + array("I", offsets).tobytes()
+        + b"".join(encoded)
+    )
+
+
+class _Writer:
+    def __init__(self):
+        self.data = bytearray()
+
+    def add(self, section: bytes) -> int:
+        offset = len(self.data)
+        self.data.extend(section)
+        _pad(self.data)
+        return offset
+
+    def add_postings(self, postings: Mapping[str, Sequence[int]]) -> dict[str, int]:
+        keys = sorted(postings)
+
+        offsets = [0]
+        for key in keys:
+            offsets.append(offsets[-1] + len(postings[key]))
+
+        positions = (position for key in keys for position in postings[key])
+
+        return {
+            "keys": self.add(_pack_strings(keys)),
+            "offsets": self.add(_pack_array(offsets)),
+            "positions": self.add(_pack_array(positions)),
+        }
+
+    def add_counts(self, counts: Mapping[str, int]) -> dict[str, int]:
+        keys = sorted(counts)
+
+        return {
+            "keys": self.add(_pack_strings(keys)),
+            "counts": self.add(_pack_array(counts[key] for key in keys)),
+        }
+
+
+def write_mapped_catalog(path: Path, compiled: dict[str, Any]):
+    writer = _Writer()
+
+    def add_index(compiled_index: dict[str, Any]) -> dict[str, Any]:
+        names = compiled_index["names"]
+        return {
+            "names": writer.add(_pack_strings(names)),
+            "normalized_names": writer.add(
+                _pack_strings([name.lower() for name in names])
+            ),
+            "postings": writer.add_postings(compiled_index["postings"]),
+            "token_postings": writer.add_postings(compiled_index["token_postings"]),
+            "vocabulary": writer.add_counts(compiled_index["vocabulary"]),
+            "word_tree": add_word_tree(compiled_index["word_tree"]),
+        }
+
+    def add_word_tree(word_tree: dict[str, list]) -> dict[str, int]:
+        return {
+            "words": writer.add(_pack_strings(word_tree["words"])),
+            "offsets": writer.add(_pack_array(word_tree["offsets"])),
+            "distances": writer.add(_pack_array(word_tree["distances"])),
+            "child_nodes": writer.add(_pack_array(word_tree["child_nodes"])),
+        }
+
+    def add_recipes(recipes: list[list]) -> dict[str, int]:
+        return {
+            "names": writer.add(_pack_strings([name for name, _ in recipes])),
+            "ids": writer.add(_pack_array(recipe_id for _, recipe_id in recipes)),
+        }
+
+    compiled_indexes = compiled["indexes"]
+    header = {
+        "version": compiled["version"],
+        "sources": compiled["sources"],
+        "byteorder": sys.byteorder,
+        "professions": {
+            profession: add_recipes(recipes)
+            for profession, recipes in compiled["professions"].items()
+        },
+        "indexes": {
+            "all": add_index(compiled_indexes["all"]),
+            "professions": {
+                profession: add_index(index)
+                for profession, index in compiled_indexes["professions"].items()
+            },
+        },
+        "tries": {
+            profession: writer.add_postings(completions)
+            for profession, completions in compiled["tries"].items()
+        },
+    }
+
+    encoded_header = bytearray(json.dumps(header).encode())
+    # keeps the sections 4-byte aligned within the file
+    encoded_header.extend(b" " * (-(len(MAGIC) + 4 + len(encoded_header)) % 4))
+
+    # a running bot may have the old file mapped, truncating it in place would
+    # pull the pages out from under it, so the new one replaces it instead
+    temporary_path = path.with_name(f"{path.name}.tmp")
+    with temporary_path.open("wb") as file:
+        file.write(MAGIC)
+        file.write(struct.pack("=I", len(encoded_header)))
+        file.write(encoded_header)
+        file.write(writer.data)
+
+    os.replace(temporary_path, path)
+
+
+def mapped_array(buffer: memoryview, offset: int) -> memoryview:
+    (count,) = struct.unpack_from("=I", buffer, offset)
+    return buffer[offset + 4 : offset + 4 + 4 * count].cast("I")
+
+
+class MappedStrings(Sequence[str]):
+    __slots__ = ("_offsets", "_blob")
+
+    def __init__(self, buffer: memoryview, offset: int):
+        (count,) = struct.unpack_from("=I", buffer, offset)
+        start = offset + 4
+        blob_start = start + 4 * (count + 1)
+
+        self._offsets = buffer[start:blob_start].cast("I")
+        self._blob = buffer[blob_start : blob_start + self._offsets[-1]]
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+
+        if position < 0:
+            position += len(self)
+
+        return str(
+            self._blob[self._offsets[position] : self._offsets[position + 1]], "utf-8"
+        )
+
+
+class MappedPostings(Mapping[str, memoryview]):
+    __slots__ = ("_keys", "_offsets", "_positions")
+
+    def __init__(self, buffer: memoryview, offsets: dict[str, int]):
+        self._keys = MappedStrings(buffer, offsets["keys"])
+        self._offsets = mapped_array(buffer, offsets["offsets"])
+        self._positions = mapped_array(buffer, offsets["positions"])
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __getitem__(self, key: str) -> memoryview:
+        # the keys are sorted, so a lookup decodes only log(n) of them
+        i = bisect.bisect_left(self._keys, key)
+        if i == len(self._keys) or self._keys[i] != key:
+            raise KeyError(key)
+
+        return self._positions[self._offsets[i] : self._offsets[i + 1]]
+
+
+class MappedCounts(Mapping[str, int]):
+    __slots__ = ("_keys", "_counts")
+
+    def __init__(self, buffer: memoryview, offsets: dict[str, int]):
+        self._keys = MappedStrings(buffer, offsets["keys"])
+        self._counts = mapped_array(buffer, offsets["counts"])
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __getitem__(self, key: str) -> int:
+        i = bisect.bisect_left(self._keys, key)
+        if i == len(self._keys) or self._keys[i] != key:
+            raise KeyError(key)
+
+        return self._counts[i]
+
+
+def read_mapped_catalog(path: Path) -> tuple[dict[str, Any], memoryview] | None:
+    # the header, and the buffer its section offsets point into
+    with path.open("rb") as file:
+        # the mapping stays valid after the file is closed
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    buffer = memoryview(mapping)
+    if buffer[: len(MAGIC)] != MAGIC:
+        return None
+
+    (header_length,) = struct.unpack_from("=I", buffer, len(MAGIC))
+    header_start = len(MAGIC) + 4
+    header = json.loads(bytes(buffer[header_start : header_start + header_length]))
+    if header["byteorder"] != sys.byteorder:
+        return None
+
+    return header, buffer[header_start + header_length :]
@@ -0,0 +1,79 @@
+import logging
+from pathlib import Path
+import asyncpg
+
+from discord_bot.database import DATABASE_CONNECTION_PARAMS
+
+
+logger = logging.getLogger(__name__)
+
+# NNNN_description.sql, applied in version order
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+
+# arbitrary, but has to be the same for every instance of the bot
+MIGRATION_LOCK_ID = 8_247_361
+
+
+def load_migrations() -> list[tuple[int, str, str]]:
+    migrations = []
+    for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        version, _, name = path.stem.partition("_")
+        migrations.append((int(version), name, path.read_text()))
+
+    return migrations
+
+
+async def apply_migrations(conn: asyncpg.Connection) -> list[int]:
+    create_query = """
+        CREATE TABLE IF NOT EXISTS schema_version (
+          version INTEGER PRIMARY KEY,
+          name VARCHAR NOT NULL,
+          applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """
+    await conn.execute(create_query)
+    applied = {
+        row["version"] for row in await conn.fetch("SELECT version FROM schema_version")
+    }
+
+    applied_now = []
+    for version, name, sql in load_migrations():
+        if version in applied:
+            continue
+
+        logger.info(f"Applying database migration {version} {name}...")
+        # a failing migration leaves neither its changes nor its version behind
+        async with conn.transaction():
+            await conn.execute(sql)
+            await conn.execute(
+                "INSERT INTO schema_version (version, name) VALUES ($1, $2)",
+                version,
+                name,
+            )
+        applied_now.append(version)
+
+    return applied_now
+
+
+async def migrate():
+    logger.info("Migrating the database schema...")
+
+    try:
+        # a connection of its own, since the advisory lock belongs to the session
+        conn = await asyncpg.connect(**DATABASE_CONNECTION_PARAMS)
+        try:
+            # other instances wait here and then find nothing left to apply
+            await conn.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_ID)
+            try:
+                applied = await apply_migrations(conn)
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
+        finally:
+            await conn.close()
+
+        logger.info(f"The database schema is up to date, applied migrations {applied}.")
+
+    except asyncpg.PostgresError as e:
+        # the bot can't run against a schema it doesn't know, so it doesn't start
+        logger.error(f"An error occurred while migrating the database.\n{e}")
+        raise
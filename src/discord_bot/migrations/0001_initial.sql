@@ -15,4 +15,4 @@ CREATE TABLE IF NOT EXISTS recipes (
   recipe_name VARCHAR NOT NULL,
 
   PRIMARY KEY (user_id, recipe_name)
-);
\ No newline at end of file
+);
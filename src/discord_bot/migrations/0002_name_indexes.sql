@@ -0,0 +1,9 @@
+-- !who looks recipes up by name, !prof groups by profession
+CREATE INDEX IF NOT EXISTS recipes_recipe_name_idx ON recipes (recipe_name, user_id);
+
+CREATE INDEX IF NOT EXISTS professions_profession_name_idx ON professions (profession_name, user_id);
+
+-- fuzzy recipe name lookups (ILIKE, similarity)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS recipes_recipe_name_trgm_idx ON recipes USING gin (recipe_name gin_trgm_ops);
@@ -0,0 +1,35 @@
+-- Moves recipe names out of recipes into recipe_catalog, which the bot seeds
+-- from profession_recipes on startup.
+
+CREATE TABLE IF NOT EXISTS recipe_catalog (
+  recipe_id SERIAL PRIMARY KEY,
+  recipe_name VARCHAR NOT NULL UNIQUE,
+  profession_name VARCHAR,
+  spell_id INTEGER
+);
+
+-- names that are no longer in profession_recipes keep their rows too
+INSERT INTO recipe_catalog (recipe_name)
+SELECT DISTINCT recipe_name FROM recipes
+ON CONFLICT (recipe_name) DO NOTHING;
+
+ALTER TABLE recipes ADD COLUMN recipe_id INTEGER;
+
+UPDATE recipes
+SET recipe_id = recipe_catalog.recipe_id
+FROM recipe_catalog
+WHERE recipe_catalog.recipe_name = recipes.recipe_name;
+
+-- also drops the primary key and the indexes on recipe_name
+ALTER TABLE recipes DROP COLUMN recipe_name;
+
+ALTER TABLE recipes
+  ALTER COLUMN recipe_id SET NOT NULL,
+  ADD PRIMARY KEY (user_id, recipe_id),
+  ADD FOREIGN KEY (recipe_id) REFERENCES recipe_catalog (recipe_id);
+
+CREATE INDEX IF NOT EXISTS recipes_recipe_id_idx ON recipes (recipe_id, user_id);
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS recipe_catalog_recipe_name_trgm_idx ON recipe_catalog USING gin (recipe_name gin_trgm_ops);
@@ -1,5 +1,7 @@
 from enum import Enum
 
+from discord_bot.search import SearchIndex
+
 
 class Profession(Enum):
     alchemy = "Alchemy"
@@ -34,3 +36,66 @@ profession_aliases = {
     Profession.lockpicking: ["lockpick", "lockpicker", "lock", "rogue"],
     Profession.rogue_poisons: ["poison"],
 }
+
+
+def _normalize_profession(value: str) -> str:
+    return value.strip().lower().replace("_", " ")
+
+
+_profession_keys = {
+    _normalize_profession(key): profession
+    for profession in Profession
+    for key in [
+        profession.name,
+        profession.value,
+        *profession_aliases.get(profession, []),
+    ]
+}
+
+
+def _build_profession_lookup() -> tuple[dict[str, Profession], set[str]]:
+    # the lookup, and the prefixes more than one profession starts with
+    lookup = dict(_profession_keys)
+
+    # a prefix resolves directly when only one profession starts with it
+    prefix_owners: dict[str, set[Profession]] = {}
+    for key, profession in _profession_keys.items():
+        for end in range(1, len(key)):
+            prefix_owners.setdefault(key[:end], set()).add(profession)
+
+    ambiguous_prefixes = set()
+    for prefix, owners in prefix_owners.items():
+        if prefix in lookup:
+            continue
+
+        if len(owners) == 1:
+            lookup[prefix] = next(iter(owners))
+        else:
+            ambiguous_prefixes.add(prefix)
+
+    return lookup, ambiguous_prefixes
+
+
+profession_lookup, ambiguous_prefixes = _build_profession_lookup()
+
+# only consulted when the direct lookup misses
+profession_index = SearchIndex(_profession_keys)
+
+
+def find_profession(raw_profession: str) -> Profession | None:
+    key = _normalize_profession(raw_profession)
+
+    profession = profession_lookup.get(key)
+    if profession is not None:
+        return profession
+
+    # e.g. "c" starts cooking and "cog" alike, typo correction would just
+    # pick one of them
+    if key in ambiguous_prefixes:
+        return None
+
+    matches = profession_index.find(key, limit=1)
+    if matches:
+        return _profession_keys[matches[0]]
+
+    return None
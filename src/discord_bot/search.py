@@ -1,43 +1,561 @@
-import difflib
+import hashlib
+import heapq
+import os
+import re
+from collections import Counter, OrderedDict
+from typing import Any, Hashable, Iterable, Mapping, Sequence
 
+DEFAULT_MAX_DISTANCE = 2
+DEFAULT_MAX_VISITS = 1000
 
-def search(
-    search_strs: list[str], source_strs: list[str]
-) -> dict[str, list[str]]:
-    result_groups = {recipe: [] for recipe in search_strs}
+SEARCH_CACHE_SIZE = int(os.environ.get("SEARCH_CACHE_SIZE", 4096))
+SEARCH_INDEX_CACHE_SIZE = int(os.environ.get("SEARCH_INDEX_CACHE_SIZE", 8))
+
+# relevance scores, lower is better
+EXACT = 0
+PREFIX = 1
+WORD_PREFIX = 2
+SUBSTRING = 3
+# every query word matched a word of the name, in any order
+TOKENS = 4
+# added once per edit needed to correct a typo in the query
+FUZZY = 5
+
+_ROMAN_NUMERALS = {
+    "i": 1,
+    "ii": 2,
+    "iii": 3,
+    "iv": 4,
+    "v": 5,
+    "vi": 6,
+    "vii": 7,
+    "viii": 8,
+    "ix": 9,
+    "x": 10,
+}
+
+# words a query may leave out, e.g. "weapon crusader" for
+# "Enchant Weapon - Crusader"
+_OPTIONAL_TOKENS = {"enchant"}
+
+
+def tokenize(value: str) -> list[str]:
+    tokens = re.findall(r"[a-z0-9]+", value.lower())
+
+    # recipe ranks are written as roman numerals, queries often use digits
+    return [str(_ROMAN_NUMERALS.get(token, token)) for token in tokens]
+
+
+def levenshtein(a: str, b: str) -> int:
+    if len(a) < len(b):
+        a, b = b, a
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (char_a != char_b),
+                )
+            )
+        previous = current
+
+    return previous[-1]
+
+
+class BKTree:
+    def __init__(self, words: Iterable[str] = ()):
+        # node 0 is the root, node i holds self.words[i] and its children as
+        # {distance: node}
+        self.words: list[str] = []
+        self.children: list[dict[int, int]] = []
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str):
+        if not self.words:
+            self.words.append(word)
+            self.children.append({})
+            return
+
+        node = 0
+        while True:
+            distance = levenshtein(word, self.words[node])
+            if distance == 0:
+                return
+
+            child = self.children[node].get(distance)
+            if child is None:
+                self.children[node][distance] = len(self.words)
+                self.words.append(word)
+                self.children.append({})
+                return
+
+            node = child
+
+    def _edges(self, node: int) -> Iterable[tuple[int, int]]:
+        return self.children[node].items()
+
+    def edges(self) -> tuple[list[int], list[int], list[int]]:
+        # offsets, distances and child nodes, the flat form CompiledBKTree reads
+        offsets = [0]
+        distances = []
+        child_nodes = []
+        for node in range(len(self.words)):
+            for distance, child in self._edges(node):
+                distances.append(distance)
+                child_nodes.append(child)
+            offsets.append(len(distances))
+
+        return offsets, distances, child_nodes
+
+    def find(
+        self, word: str, max_distance: int, max_visits: int = DEFAULT_MAX_VISITS
+    ) -> list[tuple[int, str]]:
+        return self.find_counted(word, max_distance, max_visits)[0]
+
+    def find_counted(
+        self, word: str, max_distance: int, max_visits: int = DEFAULT_MAX_VISITS
+    ) -> tuple[list[tuple[int, str]], int]:
+        # the matches and the number of nodes visited to find them
+        if not self.words:
+            return [], 0
 
-    for search_recipe in search_strs:
         matches = []
+        stack = [0]
+        visits = 0
 
-        available_recipe_names = [r.lower() for r in source_strs]
-        if search_recipe in available_recipe_names:
-            matches = [
-                r for r in source_strs if search_recipe.lower() == r.lower()
-            ]
+        while stack and visits < max_visits:
+            node = stack.pop()
+            visits += 1
+
+            node_word = self.words[node]
+            distance = levenshtein(word, node_word)
+            if distance <= max_distance:
+                matches.append((distance, node_word))
+
+            # triangle inequality: only these subtrees can hold a match
+            for child_distance, child in self._edges(node):
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+
+        return sorted(matches), visits
+
+
+class CompiledBKTree(BKTree):
+    # a tree read back from its edges(), the children of node i are
+    # child_nodes[offsets[i]:offsets[i + 1]], in the order they were added
+    def __init__(
+        self,
+        words: Sequence[str],
+        offsets: Sequence[int],
+        distances: Sequence[int],
+        child_nodes: Sequence[int],
+    ):
+        self.words = words
+        self.offsets = offsets
+        self.distances = distances
+        self.child_nodes = child_nodes
+
+    def add(self, word: str):
+        raise TypeError("CompiledBKTree is read-only")
+
+    def _edges(self, node: int) -> Iterable[tuple[int, int]]:
+        start = self.offsets[node]
+        end = self.offsets[node + 1]
+        return zip(self.distances[start:end], self.child_nodes[start:end])
+
+
+class LRUCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return (
+            f"LRUCache(maxsize={self.maxsize}, size={len(self)}, "
+            f"hits={self.hits}, misses={self.misses}, hit_rate={self.hit_rate:.2f})"
+        )
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+def fingerprint_of(parts: Iterable[Any]) -> str:
+    # a content digest, unlike hash() two corpora can't collide in practice
+    digest = hashlib.sha256()
+    for part in parts:
+        encoded = str(part).encode()
+        # length prefixed, so ("ab", "c") and ("a", "bc") differ
+        digest.update(len(encoded).to_bytes(4, "little"))
+        digest.update(encoded)
+
+    return digest.hexdigest()
+
+
+def _trigrams(value: str) -> set[str]:
+    return {value[i : i + 3] for i in range(len(value) - 2)}
+
+
+class _LazyTokenSets:
+    # tokenizes a name the first time a query needs its tokens
+    def __init__(self, names: Sequence[str]):
+        self._names = names
+        self._token_sets: dict[int, frozenset[str]] = {}
+
+    def __getitem__(self, position: int) -> frozenset[str]:
+        tokens = self._token_sets.get(position)
+        if tokens is None:
+            tokens = frozenset(tokenize(self._names[position]))
+            self._token_sets[position] = tokens
+
+        return tokens
+
+
+class SearchIndex:
+    def __init__(
+        self,
+        names: Iterable[str],
+        max_distance: int = DEFAULT_MAX_DISTANCE,
+        max_visits: int = DEFAULT_MAX_VISITS,
+        postings: Mapping[str, Sequence[int]] | None = None,
+        token_postings: Mapping[str, Sequence[int]] | None = None,
+        vocabulary: Mapping[str, int] | None = None,
+        normalized_names: Sequence[str] | None = None,
+        fingerprint: str | None = None,
+        word_tree: BKTree | None = None,
+    ):
+        self.max_distance = max_distance
+        self.max_visits = max_visits
+
+        # a compiled catalog hands in everything below prebuilt, and names
+        # that are already unique
+        prebuilt = postings is not None
+
+        # keep the first occurrence of every name, in source order
+        self.names = names if prebuilt else list(dict.fromkeys(names))
+        if normalized_names is None:
+            normalized_names = [name.lower() for name in self.names]
+        self.normalized_names = normalized_names
+
+        # identifies the corpus in cache keys
+        if fingerprint is None:
+            fingerprint = fingerprint_of([max_distance, max_visits, *self.names])
+        self.fingerprint = fingerprint
+
+        # trigram -> ascending list of positions in self.names
+        if postings is None:
+            postings = {}
+            for position, name in enumerate(self.normalized_names):
+                for trigram in _trigrams(name):
+                    postings.setdefault(trigram, []).append(position)
+        self.postings = postings
+
+        # token -> ascending list of positions in self.names
+        if token_postings is None:
+            self.token_sets = [frozenset(tokenize(name)) for name in self.names]
+
+            token_postings = {}
+            for position, tokens in enumerate(self.token_sets):
+                for token in tokens:
+                    token_postings.setdefault(token, []).append(position)
         else:
-            matches = difflib.get_close_matches(
-                search_recipe.lower(), available_recipe_names
+            self.token_sets = _LazyTokenSets(self.names)
+        self.token_postings = token_postings
+
+        if vocabulary is None:
+            vocabulary = Counter(
+                word for name in self.normalized_names for word in name.split()
             )
-            matches = [
-                r for r in source_strs if search_recipe.lower() in r.lower()
-            ]
+        self.vocabulary = vocabulary
+        # built with the rest of the index, so the first typo doesn't pay for it
+        if word_tree is None:
+            word_tree = BKTree(self.vocabulary)
+        self.word_tree = word_tree
 
-        if not matches:
-            matches = [
-                r for r in source_strs if search_recipe.lower() in r.lower()
-            ]
+    def __len__(self) -> int:
+        return len(self.names)
 
-        if matches:
-            better_matches = [
-                match for match in matches if search_recipe.lower() in match.lower()
+    def _substring_positions(self, query: str) -> list[int]:
+        # queries shorter than a trigram can't use the postings
+        if len(query) < 3:
+            return [
+                position
+                for position, name in enumerate(self.normalized_names)
+                if query in name
             ]
-            if better_matches:
-                matches = better_matches
 
-            if len(matches) == 1 or matches[0].lower() == search_recipe.lower():
-                matched_recipe = matches[0]
-                result_groups[search_recipe].append(matched_recipe)
-            else:
-                result_groups[search_recipe].extend(matches)
+        postings = sorted(
+            (self.postings.get(trigram, []) for trigram in _trigrams(query)),
+            key=len,
+        )
+
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(posting)
+
+        # sharing every trigram doesn't guarantee a substring match
+        return [
+            position
+            for position in sorted(candidates)
+            if query in self.normalized_names[position]
+        ]
+
+    def _token_positions(self, query: str) -> list[int]:
+        tokens = set(tokenize(query))
+        if not tokens:
+            return []
+
+        postings = sorted(
+            (self.token_postings.get(token, []) for token in tokens), key=len
+        )
+
+        positions = set(postings[0])
+        for posting in postings[1:]:
+            if not positions:
+                break
+            positions.intersection_update(posting)
+
+        return sorted(positions)
+
+    def _positions(self, query: str) -> list[int]:
+        substring_positions = self._substring_positions(query)
+        token_positions = self._token_positions(query)
+
+        if not token_positions:
+            return substring_positions
+
+        return sorted(set(substring_positions).union(token_positions))
+
+    def _correct(self, query: str) -> tuple[str, int] | None:
+        corrected = []
+        total_distance = 0
+        # one budget for the whole query, however many words need correcting
+        visits_left = self.max_visits
+        for word in query.split():
+            if word in self.vocabulary or word in self.token_postings:
+                corrected.append(word)
+                continue
+
+            # allow one edit per four characters, up to max_distance
+            max_distance = min(self.max_distance, len(word) // 4)
+            if max_distance == 0:
+                return None
+
+            if visits_left <= 0:
+                return None
+
+            matches, visits = self.word_tree.find_counted(
+                word, max_distance, visits_left
+            )
+            visits_left -= visits
+            if not matches:
+                return None
+
+            # closest word first, then the most common one
+            distance, best = min(
+                matches, key=lambda match: (match[0], -self.vocabulary[match[1]])
+            )
+            corrected.append(best)
+            total_distance += distance
+
+        return " ".join(corrected), total_distance
+
+    def _candidates(self, query: str) -> tuple[str, int, list[int]]:
+        positions = self._positions(query)
+        if positions:
+            return query, 0, positions
+
+        correction = self._correct(query)
+        if correction is None or correction[1] == 0:
+            return query, 0, []
+
+        corrected, distance = correction
+        return corrected, distance, self._positions(corrected)
+
+    def _is_token_exact(self, query_tokens: frozenset[str], position: int) -> bool:
+        tokens = self.token_sets[position]
+
+        return query_tokens == tokens or query_tokens == tokens - _OPTIONAL_TOKENS
+
+    def _score(
+        self, query: str, query_tokens: frozenset[str], distance: int, position: int
+    ) -> int:
+        name = self.normalized_names[position]
+
+        if name == query or self._is_token_exact(query_tokens, position):
+            match = EXACT
+        elif name.startswith(query):
+            match = PREFIX
+        elif f" {query}" in name:
+            match = WORD_PREFIX
+        elif query in name:
+            match = SUBSTRING
+        else:
+            match = TOKENS
+
+        # every corrected edit ranks below any uncorrected match
+        return match + distance * FUZZY
+
+    def rank(self, query: str, limit: int | None = None) -> list[tuple[int, str]]:
+        # normalized like search() does, so count() and direct callers agree
+        # with the cached results
+        query, distance, positions = self._candidates(normalize_query(query))
+        query_tokens = frozenset(tokenize(query))
+
+        scored = (
+            (
+                self._score(query, query_tokens, distance, position),
+                len(self.names[position]),
+                position,
+            )
+            for position in positions
+        )
+        if limit is None:
+            ranked = sorted(scored)
+        else:
+            ranked = heapq.nsmallest(limit, scored)
+
+        return [(score, self.names[position]) for score, _, position in ranked]
+
+    def count(self, query: str) -> int:
+        return len(self._candidates(normalize_query(query))[2])
+
+    def find(self, query: str, limit: int | None = None) -> list[str]:
+        return _best_matches(self.rank(query, limit))
+
+
+class ShardedSearchIndex:
+    def __init__(self, shards: dict[Hashable, SearchIndex]):
+        self.shards = shards
+        self.fingerprint = fingerprint_of(
+            part for key, shard in shards.items() for part in (key, shard.fingerprint)
+        )
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards.values())
+
+    def select(self, keys: Iterable[Hashable]) -> "ShardedSearchIndex":
+        return ShardedSearchIndex(
+            {key: self.shards[key] for key in keys if key in self.shards}
+        )
+
+    def rank(self, query: str, limit: int | None = None) -> list[tuple[int, str]]:
+        # every shard returns its candidates sorted by score already
+        merged = heapq.merge(
+            *(shard.rank(query, limit) for shard in self.shards.values()),
+            key=lambda match: match[0],
+        )
+
+        ranked = []
+        seen = set()
+        for score, name in merged:
+            # the same recipe can be taught by more than one profession
+            if name in seen:
+                continue
+            seen.add(name)
+
+            ranked.append((score, name))
+            if limit is not None and len(ranked) == limit:
+                break
+
+        return ranked
+
+    def count(self, query: str) -> int:
+        # every candidate once, like SearchIndex.count, not just the best ones
+        return len(self.rank(query))
+
+    def find(self, query: str, limit: int | None = None) -> list[str]:
+        return _best_matches(self.rank(query, limit))
+
+
+def _best_matches(ranked: list[tuple[int, str]]) -> list[str]:
+    if not ranked:
+        return []
+
+    best_score, best_name = ranked[0]
+
+    # an exact match hides every other candidate
+    if best_score % FUZZY == EXACT:
+        return [best_name]
+
+    # don't mix typo corrections with matches that needed fewer edits
+    return [name for score, name in ranked if score // FUZZY == best_score // FUZZY]
+
+
+# find() results keyed by corpus fingerprint, query and limit
+search_cache = LRUCache(SEARCH_CACHE_SIZE)
+
+# indexes over corpora that are rebuilt per command, e.g. registered recipes
+index_cache = LRUCache(SEARCH_INDEX_CACHE_SIZE)
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def get_search_index(names: Iterable[str]) -> SearchIndex:
+    names = tuple(dict.fromkeys(names))
+
+    # a changed corpus gets a new key, so stale indexes simply age out
+    index = index_cache.get(names)
+    if index is None:
+        index = SearchIndex(names)
+        index_cache.put(names, index)
+
+    return index
+
+
+def search(
+    search_strs: Iterable[str],
+    source: SearchIndex | ShardedSearchIndex | Iterable[str],
+    limit: int | None = None,
+) -> dict[str, list[str]]:
+    if not isinstance(source, (SearchIndex, ShardedSearchIndex)):
+        source = get_search_index(source)
+
+    result_groups = {}
+    for search_str in search_strs:
+        key = (source.fingerprint, normalize_query(search_str), limit)
+
+        matches = search_cache.get(key)
+        if matches is None:
+            matches = source.find(key[1], limit)
+            search_cache.put(key, matches)
+
+        result_groups[search_str] = list(matches)
 
-    return result_groups
\ No newline at end of file
+    return result_groups
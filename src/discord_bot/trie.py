@@ -0,0 +1,102 @@
+from typing import Hashable, Iterable, Mapping, Sequence
+
+# the most choices Discord shows for an autocomplete
+MAX_COMPLETIONS = 25
+
+
+class PrefixTrie:
+    def __init__(
+        self,
+        names: Iterable[str],
+        max_completions: int = MAX_COMPLETIONS,
+        completions: Mapping[str, Sequence[int]] | None = None,
+    ):
+        self.max_completions = max_completions
+
+        # a compiled catalog hands in the completions prebuilt, and names that
+        # are already unique
+        if completions is not None:
+            self.names = names
+            self.completions = completions
+            return
+
+        self.names = list(dict.fromkeys(names))
+        # every node of the trie, keyed by the prefix leading to it, with the
+        # positions of its completions, so lookups never walk subtrees
+        self.completions = {}
+
+        # shorter names first, so they win the capped slots of every node
+        positions = sorted(range(len(self.names)), key=lambda p: len(self.names[p]))
+
+        # whole names are inserted before word suffixes so that completions
+        # of the start of a name rank above completions of a later word
+        for position in positions:
+            self._insert(self.names[position].lower(), position)
+
+        for position in positions:
+            words = self.names[position].lower().split()
+            for start in range(1, len(words)):
+                self._insert(" ".join(words[start:]), position)
+
+    def _insert(self, key: str, position: int):
+        for end in range(1, len(key) + 1):
+            positions = self.completions.setdefault(key[:end], [])
+            if len(positions) < self.max_completions and position not in positions:
+                positions.append(position)
+
+    def complete(self, prefix: str, limit: int | None = None) -> list[str]:
+        limit = self.max_completions if limit is None else limit
+        prefix = " ".join(prefix.lower().split())
+
+        if not prefix:
+            return self.names[:limit]
+
+        positions = self.completions.get(prefix, ())
+        return [self.names[position] for position in positions[:limit]]
+
+
+class ShardedPrefixTrie:
+    def __init__(self, shards: dict[Hashable, PrefixTrie]):
+        self.shards = shards
+
+    def select(self, keys: Iterable[Hashable]) -> "ShardedPrefixTrie":
+        return ShardedPrefixTrie(
+            {key: self.shards[key] for key in keys if key in self.shards}
+        )
+
+    def complete(self, prefix: str, limit: int = MAX_COMPLETIONS) -> list[str]:
+        completions = {
+            name: None
+            for shard in self.shards.values()
+            for name in shard.complete(prefix, limit)
+        }
+
+        return _rank_completions(completions, prefix, limit)
+
+
+def _rank_completions(names: Iterable[str], prefix: str, limit: int) -> list[str]:
+    normalized_prefix = " ".join(prefix.lower().split())
+
+    # names starting with the prefix first, then the shortest ones
+    return sorted(
+        names,
+        key=lambda name: (
+            not name.lower().startswith(normalized_prefix),
+            len(name),
+        ),
+    )[:limit]
+
+
+def complete_names(
+    names: Iterable[str], prefix: str, limit: int = MAX_COMPLETIONS
+) -> list[str]:
+    # what a trie over the names would complete, for a few names that change
+    # too often to build one for, e.g. the recipes of a single user
+    normalized_prefix = " ".join(prefix.lower().split())
+    completions = [
+        name
+        for name in names
+        if f" {normalized_prefix}" in f" {' '.join(name.lower().split())}"
+    ]
+
+    return _rank_completions(completions, prefix, limit)
@@ -0,0 +1,171 @@
+import pytest
+
+from discord_bot.catalog import (
+    CatalogSnapshot,
+    build_catalog,
+    build_search_indexes,
+    read_compiled_catalog,
+    reload_snapshot,
+)
+from discord_bot.catalog_compiler import compile_catalog, write_compiled_catalog
+from discord_bot.profession import Profession
+
+QUERIES = ["arcanite", "arcanit reapr", "flask titans", "enchant 2h", "bar", "rod"]
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    return build_catalog()
+
+
+def _names(recipes):
+    return sorted(recipe.name for recipe in recipes)
+
+
+def test_lookup_shared_id_returns_every_recipe(catalog):
+    assert _names(catalog.lookup(13890)) == [
+        "Enchant Boots - Minor Speed",
+        "Plated Armorfish",
+    ]
+    assert _names(catalog.lookup(3818)) == ["Cured Heavy Hide", "Fadeleaf"]
+
+
+def test_lookup_shared_id_picks_the_users_profession(catalog):
+    assert _names(catalog.lookup(13890, [Profession.fishing])) == [
+        "Plated Armorfish"
+    ]
+    assert _names(catalog.lookup(13890, [Profession.enchanting])) == [
+        "Enchant Boots - Minor Speed"
+    ]
+    assert _names(catalog.lookup(3818, [Profession.leatherworking])) == [
+        "Cured Heavy Hide"
+    ]
+    assert _names(catalog.lookup(3818, [Profession.herbalism])) == ["Fadeleaf"]
+
+
+def test_lookup_shared_id_with_both_professions_is_ambiguous(catalog):
+    professions = [Profession.herbalism, Profession.leatherworking]
+    assert _names(catalog.lookup(3818, professions)) == [
+        "Cured Heavy Hide",
+        "Fadeleaf",
+    ]
+
+
+def test_lookup_other_profession(catalog):
+    assert catalog.lookup(13890, [Profession.mining]) == ()
+
+
+def test_lookup_by_name(catalog):
+    (recipe,) = catalog.lookup("  smelt   THORIUM ")
+    assert recipe.name == "Smelt Thorium"
+    assert recipe.id == 16153
+    assert recipe.profession == Profession.mining
+
+
+def test_lookup_unknown(catalog):
+    assert catalog.lookup(99_999_999) == ()
+    assert catalog.lookup("Not A Recipe") == ()
+
+
+def _records(catalog):
+    return [
+        (recipe.name, recipe.profession, recipe.id)
+        for recipes in catalog.by_profession.values()
+        for recipe in recipes
+    ]
+
+
+@pytest.fixture(scope="module")
+def compiled():
+    return compile_catalog()
+
+
+@pytest.mark.parametrize("file_name", ["recipe_catalog.json", "recipe_catalog.bin"])
+def test_compiled_catalog_round_trip(tmp_path, catalog, compiled, file_name):
+    path = tmp_path / file_name
+    write_compiled_catalog(path, compiled)
+
+    loaded = read_compiled_catalog(path)
+    built = CatalogSnapshot(catalog, *build_search_indexes(catalog))
+
+    assert _records(loaded.catalog) == _records(catalog)
+    assert list(loaded.catalog.by_id) == list(catalog.by_id)
+    recipe_index = loaded.recipe_index
+    built_index = built.recipe_index
+    assert list(recipe_index.names) == list(built_index.names)
+    professions = [Profession.alchemy, Profession.mining]
+    shards = loaded.profession_recipe_index.select(professions)
+    built_shards = built.profession_recipe_index.select(professions)
+    trie = loaded.profession_recipe_trie.select(professions)
+    built_trie = built.profession_recipe_trie.select(professions)
+    for query in QUERIES:
+        assert recipe_index.find(query) == built_index.find(query)
+        assert recipe_index.find(query, 3) == built_index.find(query, 3)
+        assert recipe_index.count(query) == built_index.count(query)
+        assert shards.find(query) == built_shards.find(query)
+        assert trie.complete(query) == built_trie.complete(query)
+    for word in ["arcanit", "thorim", "flsk", "xyz"]:
+        assert recipe_index.word_tree.find(word, 2) == built_index.word_tree.find(
+            word, 2
+        )
+
+
+@pytest.mark.parametrize(
+    "file_name, content",
+    [
+        ("recipe_catalog.json", b'{"version": 2, "sour'),
+        ("recipe_catalog.json", b"{}"),
+        ("recipe_catalog.bin", b""),
+        ("recipe_catalog.bin", b"RCATALOG\xff\xff\x00\x00{"),
+    ],
+)
+def test_corrupt_compiled_catalog_is_ignored(tmp_path, file_name, content):
+    path = tmp_path / file_name
+    path.write_bytes(content)
+
+    assert read_compiled_catalog(path) is None
+
+
+def test_missing_compiled_catalog_is_ignored(tmp_path):
+    assert read_compiled_catalog(tmp_path / "recipe_catalog.bin") is None
+
+
+def test_catalog_is_immutable(catalog):
+    with pytest.raises(AttributeError):
+        catalog.recipes = ()
+    with pytest.raises(TypeError):
+        catalog.by_name["Smelt Thorium"] = None
+
+
+def test_recipe_taught_by_several_professions(catalog):
+    recipes = catalog.all_by_name["Big Voodoo Robe"]
+
+    assert [recipe.profession for recipe in recipes] == [
+        Profession.leatherworking,
+        Profession.tailoring,
+    ]
+    # the first profession owns it, and it's listed once
+    assert catalog.by_name["Big Voodoo Robe"] is recipes[0]
+    assert catalog.names().count("Big Voodoo Robe") == 1
+    assert "Big Voodoo Robe" in catalog.names(Profession.tailoring)
+
+
+def test_snapshot_builds_the_tries(catalog):
+    snapshot = CatalogSnapshot(catalog, *build_search_indexes(catalog))
+
+    trie = snapshot.profession_recipe_trie.select([Profession.mining])
+    assert "Smelt Thorium" in trie.complete("smelt th")
+    with pytest.raises(AttributeError):
+        snapshot.catalog = None
+
+
+def test_reloaded_snapshot_is_ready_to_query():
+    snapshot = reload_snapshot()
+
+    indexes = [
+        snapshot.recipe_index,
+        *snapshot.profession_recipe_index.shards.values(),
+    ]
+    # the word trees are built with the snapshot, not on the first typo
+    assert all(index.word_tree is not None for index in indexes)
+    assert snapshot.recipe_index.word_tree.find("thorim", 1) == [(1, "thorium")]
@@ -0,0 +1,105 @@
+from discord_bot.directory import CrafterDirectory
+
+USERS = [(1, "bob"), (2, "Alice")]
+PROFESSIONS = [(1, "Mining"), (2, "Mining"), (2, "Alchemy")]
+RECIPES = [(1, "Smelt Thorium"), (2, "Smelt Thorium"), (2, "Flask of the Titans")]
+
+
+def loaded_directory() -> CrafterDirectory:
+    directory = CrafterDirectory()
+    directory.load(USERS, PROFESSIONS, RECIPES)
+    return directory
+
+
+def test_unloaded_reads_fall_back_to_the_database():
+    directory = CrafterDirectory()
+
+    assert directory.get_user_context(1) is None
+    assert directory.get_recipe_crafters(["Smelt Thorium"]) is None
+    assert (directory.hits, directory.misses) == (0, 2)
+
+
+def test_reads_are_shaped_like_the_database_rows():
+    directory = loaded_directory()
+
+    assert directory.get_profession_members(["Mining"]) == [
+        {"profession_name": "Mining", "user_names": ["Alice", "bob"]}
+    ]
+    assert directory.get_recipe_crafters(["Smelt Thorium", "Unknown"]) == [
+        {"recipe_name": "Smelt Thorium", "user_names": ["Alice", "bob"]}
+    ]
+    assert directory.get_user_context(1) == {
+        "user_name": "bob",
+        "professions": ["Mining"],
+        "recipes": ["Smelt Thorium"],
+    }
+
+
+def test_write_through_bumps_the_version():
+    directory = loaded_directory()
+    version = directory.version
+
+    directory.add_recipes(1, ["Arcanite Reaper"])
+    directory.remove_recipes(2, ["Smelt Thorium"])
+    directory.remove_profession(2, "Mining")
+
+    assert directory.version == version + 3
+    assert directory.get_recipe_crafters(["Smelt Thorium", "Arcanite Reaper"]) == [
+        {"recipe_name": "Smelt Thorium", "user_names": ["bob"]},
+        {"recipe_name": "Arcanite Reaper", "user_names": ["bob"]},
+    ]
+    assert directory.get_profession_members(["Mining"]) == [
+        {"profession_name": "Mining", "user_names": ["bob"]}
+    ]
+
+
+def test_removing_the_last_crafter_forgets_the_recipe():
+    directory = loaded_directory()
+
+    directory.remove_recipes(2, ["Flask of the Titans"])
+
+    assert {"recipe_name": "Flask of the Titans"} not in (
+        directory.get_registered_recipe_names()
+    )
+
+
+def test_apply_patches_changes_of_other_processes():
+    directory = loaded_directory()
+    version = directory.version
+
+    directory.apply("users", "add", 3, ["carol"])
+    directory.apply("professions", "add", 3, ["Mining"])
+    directory.apply("recipes", "add", 3, ["Smelt Thorium"])
+    directory.apply("recipes", "remove", 1, ["Smelt Thorium"])
+    directory.apply("professions", "remove", 1, ["Mining"])
+
+    assert directory.version == version + 5
+    assert directory.get_recipe_crafters(["Smelt Thorium"]) == [
+        {"recipe_name": "Smelt Thorium", "user_names": ["Alice", "carol"]}
+    ]
+    assert directory.get_user_context(1)["professions"] == []
+
+
+def test_invalidate_until_the_next_load():
+    directory = loaded_directory()
+
+    directory.invalidate()
+    assert directory.get_user_context(1) is None
+
+    directory.load(USERS, PROFESSIONS, RECIPES)
+    assert directory.get_user_context(1)["recipes"] == ["Smelt Thorium"]
+
+
+def test_reconcile_counts_stale_entries():
+    directory = loaded_directory()
+    assert directory.reconciliations == 0
+
+    # changes this process missed: bob dropped a recipe, so did Alice, and
+    # carol joined
+    users = USERS + [(3, "carol")]
+    recipes = [(2, "Smelt Thorium")]
+
+    assert directory.load(users, PROFESSIONS, recipes) == 3
+    assert (directory.reconciliations, directory.stale_entries) == (1, 3)
+    assert directory.load(users, PROFESSIONS, recipes) == 0
+    assert (directory.reconciliations, directory.stale_entries) == (2, 3)
@@ -0,0 +1,127 @@
+import pytest
+
+from discord_bot.mapped_catalog import (
+    MappedCounts,
+    MappedPostings,
+    MappedStrings,
+    mapped_array,
+    read_mapped_catalog,
+    write_mapped_catalog,
+)
+
+COMPILED = {
+    "version": 1,
+    "sources": "abc",
+    "professions": {"Mining": [["Smelt Thorium", 16153], ["Smelt Mithril", 0]]},
+    "indexes": {
+        "all": {
+            "names": ["Smelt Thorium", "Smelt Mithril", "Žaltys ünïcode"],
+            "postings": {"sme": [0, 1], "tho": [0], "ünï": [2]},
+            "token_postings": {"smelt": [0, 1], "thorium": [0]},
+            "vocabulary": {"smelt": 2, "thorium": 1, "mithril": 1},
+            "word_tree": {
+                "words": ["smelt", "thorium", "mithril"],
+                "offsets": [0, 1, 2, 2],
+                "distances": [7, 5],
+                "child_nodes": [1, 2],
+            },
+        },
+        "professions": {},
+    },
+    "tries": {"Mining": {"s": [0, 1], "sm": [0, 1], "smelt t": [0]}},
+}
+
+
+@pytest.fixture
+def mapped(tmp_path):
+    path = tmp_path / "recipe_catalog.bin"
+    write_mapped_catalog(path, COMPILED)
+    return read_mapped_catalog(path)
+
+
+def test_header(mapped):
+    header, _ = mapped
+
+    assert header["version"] == 1
+    assert header["sources"] == "abc"
+    assert list(header["professions"]) == ["Mining"]
+
+
+def test_strings(mapped):
+    header, buffer = mapped
+    names = MappedStrings(buffer, header["indexes"]["all"]["names"])
+
+    assert len(names) == 3
+    assert list(names) == COMPILED["indexes"]["all"]["names"]
+    assert names[-1] == "Žaltys ünïcode"
+    assert names[1:] == ["Smelt Mithril", "Žaltys ünïcode"]
+
+
+def test_recipes(mapped):
+    header, buffer = mapped
+    offsets = header["professions"]["Mining"]
+
+    assert list(MappedStrings(buffer, offsets["names"])) == [
+        "Smelt Thorium",
+        "Smelt Mithril",
+    ]
+    assert list(mapped_array(buffer, offsets["ids"])) == [16153, 0]
+
+
+def test_postings(mapped):
+    header, buffer = mapped
+    postings = MappedPostings(buffer, header["indexes"]["all"]["postings"])
+
+    assert sorted(postings) == ["sme", "tho", "ünï"]
+    assert list(postings["sme"]) == [0, 1]
+    assert list(postings["ünï"]) == [2]
+    assert postings.get("xyz") is None
+    with pytest.raises(KeyError):
+        postings["aaa"]
+
+
+def test_counts(mapped):
+    header, buffer = mapped
+    vocabulary = MappedCounts(buffer, header["indexes"]["all"]["vocabulary"])
+
+    assert dict(vocabulary) == COMPILED["indexes"]["all"]["vocabulary"]
+    assert "zinc" not in vocabulary
+
+
+def test_word_tree(mapped):
+    header, buffer = mapped
+    offsets = header["indexes"]["all"]["word_tree"]
+
+    assert list(MappedStrings(buffer, offsets["words"])) == [
+        "smelt",
+        "thorium",
+        "mithril",
+    ]
+    assert list(mapped_array(buffer, offsets["offsets"])) == [0, 1, 2, 2]
+    assert list(mapped_array(buffer, offsets["child_nodes"])) == [1, 2]
+
+
+def test_trie_completions(mapped):
+    header, buffer = mapped
+    completions = MappedPostings(buffer, header["tries"]["Mining"])
+
+    assert list(completions["s"]) == [0, 1]
+    assert list(completions["smelt t"]) == [0]
+    assert completions.get("x") is None
+
+
+def test_not_a_mapped_catalog(tmp_path):
+    path = tmp_path / "recipe_catalog.bin"
+    path.write_bytes(b"NOTCATALOG" * 4)
+
+    assert read_mapped_catalog(path) is None
+
+
+def test_rewrite_keeps_an_open_mapping_valid(mapped, tmp_path):
+    header, buffer = mapped
+    names = MappedStrings(buffer, header["indexes"]["all"]["names"])
+
+    write_mapped_catalog(tmp_path / "recipe_catalog.bin", {**COMPILED, "sources": "d"})
+
+    assert names[0] == "Smelt Thorium"
+    assert not (tmp_path / "recipe_catalog.bin.tmp").exists()
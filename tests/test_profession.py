@@ -0,0 +1,22 @@
+import pytest
+
+from discord_bot.profession import Profession, find_profession
+
+
+@pytest.mark.parametrize(
+    "raw_profession, profession",
+    [
+        ("Mining", Profession.mining),
+        ("first_aid", Profession.first_aid),
+        ("bs", Profession.blacksmithing),
+        ("lockp", Profession.lockpicking),
+        ("alchmy", Profession.alchemy),
+    ],
+)
+def test_find_profession(raw_profession, profession):
+    assert find_profession(raw_profession) is profession
+
+
+@pytest.mark.parametrize("raw_profession", ["c", "f", "r", "en", "xyzzy"])
+def test_ambiguous_or_unknown_profession_is_not_found(raw_profession):
+    assert find_profession(raw_profession) is None
@@ -0,0 +1,147 @@
+"""Query plan regression check for the !who and !prof queries.
+
+Creates a scratch schema on the database configured by the POSTGRES_*
+environment variables, applies the bot's migrations to it, seeds it with 100k
+rows and asserts that the planner answers the queries behind !who and !prof
+with index scans. The queries are the ones database.py runs. Skipped unless
+POSTGRES_HOST is set.
+
+    POSTGRES_HOST=localhost python -m pytest tests/test_query_plans.py
+"""
+
+import asyncio
+import json
+import os
+
+import asyncpg
+import pytest
+
+from discord_bot.catalog import build_catalog
+from discord_bot.database import (
+    DATABASE_CONNECTION_PARAMS,
+    PROFESSION_MEMBERS_QUERY,
+    RECIPE_CRAFTERS_QUERY,
+)
+from discord_bot.migrate import apply_migrations
+from discord_bot.profession import Profession
+
+pytestmark = pytest.mark.skipif(
+    not os.environ.get("POSTGRES_HOST"), reason="needs a database, set POSTGRES_HOST"
+)
+
+SCHEMA = "query_plan_check"
+
+SEED_ROWS = 100_000
+SEED_USERS = 10_000
+
+# a bare !prof runs ALL_PROFESSION_MEMBERS_QUERY, which aggregates every row
+# of professions, so a sequential scan is the right plan for it and it isn't
+# checked
+QUERIES = {
+    "!who": (
+        RECIPE_CRAFTERS_QUERY,
+        (["Arcanite Reaper", "Flask of the Titans"],),
+        "recipes",
+    ),
+    "!prof <profession>": (
+        PROFESSION_MEMBERS_QUERY,
+        ([Profession.lockpicking.value],),
+        "professions",
+    ),
+}
+
+INDEX_SCANS = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+
+
+async def seed(conn: asyncpg.Connection):
+    recipe_names = build_catalog().names()
+    profession_names = [profession.value for profession in Profession]
+
+    await conn.execute(
+        """
+            INSERT INTO users (user_id, user_name)
+            SELECT user_id, 'user ' || user_id FROM generate_series(1, $1) AS user_id
+        """,
+        SEED_USERS,
+    )
+    await conn.execute(
+        """
+            INSERT INTO recipe_catalog (recipe_name)
+            SELECT DISTINCT unnest($1::varchar[])
+        """,
+        recipe_names,
+    )
+    await conn.execute(
+        """
+            INSERT INTO recipes (user_id, recipe_id)
+            SELECT 1 + row % $2, 1 + row % (SELECT count(*) FROM recipe_catalog)
+            FROM generate_series(0, $1 - 1) AS row
+            ON CONFLICT DO NOTHING
+        """,
+        SEED_ROWS,
+        SEED_USERS,
+    )
+    await conn.execute(
+        """
+            INSERT INTO professions (user_id, profession_name)
+            SELECT 1 + row / cardinality($2::varchar[]),
+                   ($2::varchar[])[1 + row % cardinality($2::varchar[])]
+            FROM generate_series(0, $1 - 1) AS row
+            ON CONFLICT DO NOTHING
+        """,
+        SEED_ROWS,
+        profession_names,
+    )
+    # autovacuum would have set the visibility map on a live table
+    await conn.execute("VACUUM ANALYZE users, recipe_catalog, recipes, professions")
+
+
+def plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+async def explain_queries() -> dict[str, set[str]]:
+    # the plan nodes reading the table of every query
+    conn = await asyncpg.connect(**DATABASE_CONNECTION_PARAMS)
+    try:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.execute(f"CREATE SCHEMA {SCHEMA}")
+        # extensions such as pg_trgm stay reachable through public
+        await conn.execute(f"SET search_path TO {SCHEMA}, public")
+
+        await apply_migrations(conn)
+        await seed(conn)
+
+        scans = {}
+        for name, (query, args, table) in QUERIES.items():
+            explained = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {query}", *args)
+            plan = json.loads(explained)[0]["Plan"]
+
+            scans[name] = {
+                node["Node Type"]
+                for node in plan_nodes(plan)
+                if node.get("Relation Name") == table
+                or node.get("Index Name", "").startswith(f"{table}_")
+            }
+    finally:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+    return scans
+
+
+@pytest.fixture(scope="module")
+def scans():
+    # seeding takes a while, so it's done once for every query
+    return asyncio.run(explain_queries())
+
+
+@pytest.mark.parametrize("name", QUERIES)
+def test_query_uses_an_index(scans, name):
+    table = QUERIES[name][2]
+
+    assert scans[name] & INDEX_SCANS, (
+        f"{name} reads {table} with {', '.join(sorted(scans[name]))}"
+    )
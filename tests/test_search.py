@@ -0,0 +1,157 @@
+from discord_bot.search import (
+    BKTree,
+    CompiledBKTree,
+    LRUCache,
+    SearchIndex,
+    ShardedSearchIndex,
+    levenshtein,
+    search,
+)
+
+NAMES = [
+    "Arcanite Reaper",
+    "Arcanite Rod",
+    "Arcanite Skeleton Key",
+    "Smelt Arcanite",
+    "Thorium Bar",
+    "Mithril Bar",
+    "Barbaric Harness",
+]
+
+
+def test_count_ignores_extra_whitespace():
+    index = SearchIndex(NAMES)
+
+    assert index.count(" BAR  ") == index.count("bar") == 3
+    assert len(search([" BAR  "], index)[" BAR  "]) == 3
+
+
+def test_sharded_count_ignores_extra_whitespace():
+    index = ShardedSearchIndex(
+        {"weapons": SearchIndex(NAMES[:3]), "smelting": SearchIndex(NAMES[3:])}
+    )
+
+    assert index.count(" bar ") == index.count("bar") == 3
+    assert index.find(" Arcanite\tRod ") == ["Arcanite Rod"]
+
+
+def test_sharded_count_matches_the_unsharded_count():
+    names = ["Thorium Bar", "Thorium Bar Mold", "Smelt Thorium", "Thorium Bar"]
+    index = SearchIndex(names)
+    sharded = ShardedSearchIndex(
+        {"mining": SearchIndex(names[:3]), "smelting": SearchIndex(names[2:])}
+    )
+
+    for query in ["thorium bar", "thorium", "thorum bar", "xyz"]:
+        assert sharded.count(query) == index.count(query)
+    assert sharded.count("thorium bar") == 2
+
+
+def test_fingerprint_is_a_content_digest():
+    assert SearchIndex(NAMES).fingerprint == SearchIndex(list(NAMES)).fingerprint
+    assert SearchIndex(["ab", "c"]).fingerprint != SearchIndex(["a", "bc"]).fingerprint
+    assert SearchIndex(NAMES).fingerprint != SearchIndex(NAMES[:-1]).fingerprint
+
+
+def test_find_ranks_exact_prefix_and_typo_matches():
+    index = SearchIndex(NAMES)
+
+    assert index.find("arcanite rod") == ["Arcanite Rod"]
+    assert index.find("arcanite r") == ["Arcanite Rod", "Arcanite Reaper"]
+    assert index.find("arcanit reapr") == ["Arcanite Reaper"]
+    assert index.find("no such recipe") == []
+
+
+def test_find_limit():
+    index = SearchIndex(NAMES)
+
+    assert len(index.find("arcanite", limit=2)) == 2
+    assert index.count("arcanite") == 4
+
+
+def test_sharded_index_select_and_duplicates():
+    index = ShardedSearchIndex(
+        {
+            "blacksmithing": SearchIndex(["Arcanite Reaper", "Arcanite Rod"]),
+            "engineering": SearchIndex(["Arcanite Rod", "Arcanite Dragonling"]),
+        }
+    )
+
+    # a recipe taught by two shards is returned once
+    assert sorted(index.find("arcanite")) == [
+        "Arcanite Dragonling",
+        "Arcanite Reaper",
+        "Arcanite Rod",
+    ]
+    assert index.select(["engineering"]).find("arcanite reaper") == []
+    assert index.select(["engineering", "unknown"]).find("dragonling") == [
+        "Arcanite Dragonling"
+    ]
+
+
+def test_levenshtein():
+    assert levenshtein("reaper", "reaper") == 0
+    assert levenshtein("reapr", "reaper") == 1
+    assert levenshtein("", "abc") == 3
+    assert levenshtein("kitten", "sitting") == 3
+
+
+def test_bk_tree_finds_words_within_distance():
+    tree = BKTree(["reaper", "rod", "reaver", "leaper", "thorium"])
+
+    assert tree.find("reaper", 0) == [(0, "reaper")]
+    assert tree.find("reapr", 1) == [(1, "reaper")]
+    assert tree.find("reaper", 1) == [(0, "reaper"), (1, "leaper"), (1, "reaver")]
+    assert tree.find("xyz", 1) == []
+    assert BKTree().find("reaper", 2) == []
+
+
+def test_bk_tree_matches_brute_force():
+    words = {word for name in NAMES for word in name.lower().split()}
+    tree = BKTree(words)
+
+    for query in ["arcanit", "bar", "rod", "harnes", "thorim"]:
+        distances = {(levenshtein(query, word), word) for word in words}
+        expected = sorted(match for match in distances if match[0] <= 2)
+        assert tree.find(query, 2) == expected
+
+
+def test_compiled_bk_tree_matches_the_tree_it_came_from():
+    words = {word for name in NAMES for word in name.lower().split()}
+    tree = BKTree(words)
+    compiled = CompiledBKTree(tree.words, *tree.edges())
+
+    for query in ["arcanit", "bar", "rod", "harnes", "thorim"]:
+        assert compiled.find_counted(query, 2) == tree.find_counted(query, 2)
+    assert CompiledBKTree([], [0], [], []).find("reaper", 2) == []
+
+
+def test_typo_correction_shares_one_visit_budget_per_query():
+    _, visits = SearchIndex(NAMES).word_tree.find_counted("reapr", 1)
+    index = SearchIndex(NAMES, max_visits=visits)
+
+    assert index.find("reapr") == ["Arcanite Reaper"]
+    # "arcanit" spends part of the budget "reapr" needs
+    assert index.find("arcanit reapr") == []
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert (cache.hits, cache.misses) == (3, 1)
+    assert cache.hit_rate == 0.75
+
+
+def test_search_caches_results_per_corpus():
+    first = search(["rod"], ["Arcanite Rod", "Fiery Rod"])
+    second = search(["rod"], ["Golden Rod"])
+
+    assert sorted(first["rod"]) == ["Arcanite Rod", "Fiery Rod"]
+    assert second["rod"] == ["Golden Rod"]
@@ -0,0 +1,70 @@
+from discord_bot.trie import PrefixTrie, ShardedPrefixTrie, complete_names
+
+NAMES = [
+    "Arcanite Reaper",
+    "Arcanite Rod",
+    "Smelt Arcanite",
+    "Enchant Weapon - Crusader",
+    "Thorium Bar",
+]
+
+
+def test_complete_prefix_of_the_name():
+    trie = PrefixTrie(NAMES)
+
+    assert trie.complete("arc") == ["Arcanite Rod", "Arcanite Reaper", "Smelt Arcanite"]
+    assert trie.complete("ARCANITE  RE") == ["Arcanite Reaper"]
+    assert trie.complete("xyz") == []
+
+
+def test_complete_prefix_of_a_later_word():
+    trie = PrefixTrie(NAMES)
+
+    assert trie.complete("crus") == ["Enchant Weapon - Crusader"]
+    assert trie.complete("bar") == ["Thorium Bar"]
+
+
+def test_complete_empty_prefix_and_limit():
+    trie = PrefixTrie(NAMES, max_completions=2)
+
+    assert trie.complete("") == NAMES[:2]
+    assert len(trie.complete("arc")) == 2
+    assert PrefixTrie(NAMES).complete("arc", limit=1) == ["Arcanite Rod"]
+
+
+def test_duplicate_names_are_completed_once():
+    trie = PrefixTrie(["Arcanite Rod", "Arcanite Rod"])
+
+    assert trie.complete("arc") == ["Arcanite Rod"]
+
+
+def test_sharded_trie_merges_and_selects():
+    trie = ShardedPrefixTrie(
+        {
+            "blacksmithing": PrefixTrie(["Arcanite Reaper", "Arcanite Rod"]),
+            "engineering": PrefixTrie(["Arcanite Rod", "Arcanite Dragonling"]),
+            "mining": PrefixTrie(["Smelt Arcanite"]),
+        }
+    )
+
+    # names starting with the prefix come first, then the shorter ones
+    assert trie.complete("arcanite") == [
+        "Arcanite Rod",
+        "Arcanite Reaper",
+        "Arcanite Dragonling",
+        "Smelt Arcanite",
+    ]
+    assert trie.select(["mining", "unknown"]).complete("arc") == ["Smelt Arcanite"]
+    assert trie.complete("arcanite", limit=2) == ["Arcanite Rod", "Arcanite Reaper"]
+
+
+def test_complete_names_without_a_trie():
+    assert complete_names(NAMES, "arc") == [
+        "Arcanite Rod",
+        "Arcanite Reaper",
+        "Smelt Arcanite",
+    ]
+    assert complete_names(NAMES, "crus") == ["Enchant Weapon - Crusader"]
+    # only the start of a word matches, like in the trie
+    assert complete_names(NAMES, "rium") == []
+    assert complete_names(NAMES, "", limit=2) == ["Thorium Bar", "Arcanite Rod"]